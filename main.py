@@ -8,20 +8,65 @@ Python Persona Engine - 主应用程序入口
 """
 
 import asyncio
-import argparse
 import sys
 import os
 import signal
+import threading
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Optional
+from types import SimpleNamespace
+from typing import Optional, TYPE_CHECKING
 from loguru import logger
 
 # 添加项目根目录到Python路径
 sys.path.insert(0, str(Path(__file__).parent))
 
-from src.core.avatar_engine import AvatarEngine
 from src.utils.config import Config
-from src.ui.control_panel import ControlPanel
+
+# 引擎和控制面板会拉起语音、模型、UI 等重量级依赖，在实际使用时才导入
+if TYPE_CHECKING:
+    from src.core.avatar_engine import AvatarEngine
+    from src.ui.control_panel import ControlPanel
+
+
+# 日志压缩线程，避免轮转时在日志调用路径上同步压缩
+_log_compression_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="log-compress")
+
+
+def _zip_rotated_log(path: str):
+    """压缩已轮转的日志文件并删除原文件"""
+    try:
+        with zipfile.ZipFile(f"{path}.zip", "w", zipfile.ZIP_DEFLATED) as zf:
+            zf.write(path, arcname=os.path.basename(path))
+        os.remove(path)
+    except Exception as e:
+        print(f"日志压缩失败: {e}")
+
+
+def _schedule_log_compression(path: str):
+    """loguru 轮转回调：将压缩任务提交到后台线程"""
+    _log_compression_executor.submit(_zip_rotated_log, path)
+
+
+# 运行所需的目录
+REQUIRED_DIRECTORIES = (
+    "logs",
+    "resources/live2d",
+    "resources/models",
+    "resources/sounds",
+    "config"
+)
+
+# 展开所有父目录并去重，按深度排序保证父目录先创建，每个目录只访问一次
+_DIRECTORY_CREATION_ORDER = tuple(sorted(
+    frozenset(
+        str(Path(*Path(directory).parts[:depth]))
+        for directory in REQUIRED_DIRECTORIES
+        for depth in range(1, len(Path(directory).parts) + 1)
+    ),
+    key=lambda path: (len(Path(path).parts), path)
+))
 
 
 class PersonaEngineApp:
@@ -33,11 +78,18 @@ class PersonaEngineApp:
         
         # 核心组件
         self.config: Optional[Config] = None
-        self.engine: Optional[AvatarEngine] = None
-        self.ui: Optional[ControlPanel] = None
+        self.engine: Optional["AvatarEngine"] = None
+        self.ui: Optional["ControlPanel"] = None
         
         # 运行控制
         self._shutdown_event = asyncio.Event()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._cleaned = False
+        self._engine_loop: Optional[asyncio.AbstractEventLoop] = None
+        self._engine_thread: Optional[threading.Thread] = None
+        
+        # 状态中不随运行变化的部分，仅在初始化时重建
+        self._static_status = self._build_static_status()
         
         logger.info("Python Persona Engine 应用程序初始化")
 
@@ -57,12 +109,9 @@ class PersonaEngineApp:
             self._create_directories()
             
             # 初始化核心引擎
+            from src.core.avatar_engine import AvatarEngine
             self.engine = AvatarEngine(self.config)
-            
-            # 如果启用UI，初始化控制面板
-            if self.enable_ui:
-                self.ui = ControlPanel(self.engine, self.config)
-                self.ui.initialize()
+            self._static_status = self._build_static_status()
             
             logger.info("应用程序初始化完成")
             return True
@@ -85,7 +134,8 @@ class PersonaEngineApp:
                        "<level>{level: <8}</level> | "
                        "<cyan>{name}</cyan>:<cyan>{function}</cyan>:<cyan>{line}</cyan> - "
                        "<level>{message}</level>",
-                colorize=True
+                colorize=True,
+                enqueue=True
             )
             
             # 文件输出
@@ -98,7 +148,8 @@ class PersonaEngineApp:
                 format="{time:YYYY-MM-DD HH:mm:ss} | {level: <8} | {name}:{function}:{line} - {message}",
                 rotation=self.config.logging.max_file_size,
                 retention=self.config.logging.backup_count,
-                compression="zip"
+                compression=_schedule_log_compression,
+                enqueue=True
             )
             
             logger.info(f"日志系统已配置，级别: {self.config.logging.level}")
@@ -107,22 +158,15 @@ class PersonaEngineApp:
             print(f"日志系统配置失败: {e}")
 
     def _create_directories(self):
-        """创建必要的目录"""
-        directories = [
-            "logs",
-            "resources/live2d",
-            "resources/models",
-            "resources/sounds",
-            "config"
-        ]
-        
-        for directory in directories:
-            Path(directory).mkdir(parents=True, exist_ok=True)
+        """创建必要的目录（每次启动都检查，被删除的目录会重新创建）"""
+        for directory in _DIRECTORY_CREATION_ORDER:
+            os.makedirs(directory, exist_ok=True)
 
     async def run(self):
-        """运行应用程序"""
+        """运行应用程序（无界面模式）"""
         try:
             logger.info("Python Persona Engine 启动中...")
+            self._loop = asyncio.get_running_loop()
             
             # 初始化
             if not await self.initialize():
@@ -132,12 +176,7 @@ class PersonaEngineApp:
             # 设置信号处理
             self._setup_signal_handlers()
             
-            if self.enable_ui:
-                # UI模式
-                await self._run_with_ui()
-            else:
-                # 命令行模式
-                await self._run_headless()
+            await self._run_headless()
             
             logger.info("应用程序正常退出")
             return 0
@@ -151,21 +190,62 @@ class PersonaEngineApp:
         finally:
             await self._cleanup()
 
-    async def _run_with_ui(self):
-        """运行UI模式"""
+    def run_with_ui(self) -> int:
+        """运行UI模式：Tk 占用主线程，引擎运行在专用后台线程的事件循环上"""
+        self._engine_loop = asyncio.new_event_loop()
+        self._engine_thread = threading.Thread(
+            target=self._engine_loop.run_forever,
+            name="engine-loop",
+            daemon=True
+        )
+        self._engine_thread.start()
+        self._loop = self._engine_loop
+        
         try:
-            logger.info("启动UI模式")
+            logger.info("Python Persona Engine 启动中...")
             
-            # 在单独线程中运行UI
-            import threading
-            ui_thread = threading.Thread(target=self.ui.run, daemon=True)
-            ui_thread.start()
+            # 初始化
+            if not self._run_on_engine_loop(self.initialize()):
+                logger.error("初始化失败，程序退出")
+                return 1
             
-            # 等待关闭信号
-            await self._shutdown_event.wait()
+            # Tk 不是线程安全的，控制面板必须在主线程中创建和运行
+            logger.info("启动UI模式")
+            from src.ui.control_panel import ControlPanel
+            self.ui = ControlPanel(
+                self.engine,
+                self.config,
+                engine_loop=self._engine_loop,
+                on_close=self.request_shutdown
+            )
+            self.ui.initialize()
+            self.ui.run()
             
+            logger.info("应用程序正常退出")
+            return 0
+            
+        except KeyboardInterrupt:
+            logger.info("收到中断信号，正在退出...")
+            return 0
         except Exception as e:
             logger.error(f"UI模式运行失败: {e}")
+            return 1
+        finally:
+            self._run_on_engine_loop(self._cleanup())
+            self._engine_loop.call_soon_threadsafe(self._engine_loop.stop)
+            self._engine_thread.join(timeout=5.0)
+            self._engine_loop.close()
+            self._engine_loop = None
+            self._loop = None
+
+    def request_shutdown(self):
+        """请求关闭程序，可在任意线程调用"""
+        if self._loop and not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self._shutdown_event.set)
+
+    def _run_on_engine_loop(self, coro):
+        """在引擎事件循环上执行协程并阻塞等待结果"""
+        return asyncio.run_coroutine_threadsafe(coro, self._engine_loop).result()
 
     async def _run_headless(self):
         """运行无界面模式"""
@@ -185,20 +265,29 @@ class PersonaEngineApp:
 
     def _setup_signal_handlers(self):
         """设置信号处理器"""
-        def signal_handler(signum, frame):
+        loop = asyncio.get_running_loop()
+
+        def on_signal(signum: int):
             logger.info(f"收到信号 {signum}，开始关闭程序")
-            asyncio.create_task(self._shutdown())
-        
-        signal.signal(signal.SIGINT, signal_handler)
-        signal.signal(signal.SIGTERM, signal_handler)
+            self._shutdown_event.set()
 
-    async def _shutdown(self):
-        """关闭应用程序"""
-        logger.info("开始关闭应用程序...")
-        self._shutdown_event.set()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                # POSIX: 信号回调直接在事件循环中执行
+                loop.add_signal_handler(sig, on_signal, sig)
+            except NotImplementedError:
+                # Windows: 回退到 signal.signal，仅通过 call_soon_threadsafe 通知事件循环
+                signal.signal(
+                    sig,
+                    lambda signum, frame: loop.call_soon_threadsafe(on_signal, signum)
+                )
 
     async def _cleanup(self):
-        """清理资源"""
+        """清理资源（幂等，重复调用时直接返回）"""
+        if self._cleaned:
+            return
+        self._cleaned = True
+        
         try:
             logger.info("清理应用程序资源...")
             
@@ -210,24 +299,28 @@ class PersonaEngineApp:
         except Exception as e:
             logger.error(f"资源清理失败: {e}")
 
-    def get_status(self) -> dict:
-        """获取应用程序状态"""
-        status = {
+    def _build_static_status(self) -> dict:
+        """构建状态中的静态部分"""
+        return {
             "config_loaded": self.config is not None,
             "engine_initialized": self.engine is not None,
             "ui_enabled": self.enable_ui,
         }
+
+    def get_status(self) -> dict:
+        """获取应用程序状态"""
+        if not self.engine:
+            return dict(self._static_status)
         
-        if self.engine:
-            status["engine_state"] = self.engine.get_state().value
-            status["metrics"] = self.engine.get_metrics()
-        
-        return status
+        return {
+            **self._static_status,
+            "engine_state": self.engine.state_value,
+            "metrics": self.engine.get_metrics(),
+        }
 
 
-def print_banner():
-    """打印启动横幅"""
-    banner = """
+# 启动横幅在导入时一次性编码
+BANNER = """
 ╔══════════════════════════════════════════════════════════════╗
 ║                                                              ║
 ║  🎭 Python Persona Engine                                    ║
@@ -244,16 +337,24 @@ def print_banner():
 ║  • 🖥️ 现代化控制界面                                        ║
 ║                                                              ║
 ╚══════════════════════════════════════════════════════════════╝
-    """
-    print(banner)
+    
+""".encode("utf-8")
 
 
-def main():
-    """主函数"""
-    # 打印启动横幅
-    print_banner()
+def print_banner():
+    """打印启动横幅"""
+    sys.stdout.buffer.write(BANNER)
+    sys.stdout.flush()
+
+
+# 无参数启动时使用的默认参数，与 parse_args() 的默认值保持一致
+DEFAULT_ARGS = SimpleNamespace(config="config/config.yaml", no_ui=False, debug=False)
+
+
+def parse_args():
+    """解析命令行参数"""
+    import argparse
     
-    # 解析命令行参数
     parser = argparse.ArgumentParser(
         description="Python Persona Engine - AI驱动的交互式虚拟角色引擎",
         formatter_class=argparse.RawDescriptionHelpFormatter,
@@ -268,7 +369,7 @@ def main():
     
     parser.add_argument(
         "--config", "-c",
-        default="config/config.yaml",
+        default=DEFAULT_ARGS.config,
         help="配置文件路径 (默认: config/config.yaml)"
     )
     
@@ -290,7 +391,30 @@ def main():
         version="Python Persona Engine v1.0.0"
     )
     
-    args = parser.parse_args()
+    return parser.parse_args()
+
+
+def install_event_loop_policy():
+    """安装了 uvloop 时使用其事件循环（Windows 不支持 uvloop，保持默认）"""
+    try:
+        import uvloop
+    except ImportError:
+        return
+    
+    asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+    logger.debug("使用 uvloop 事件循环")
+
+
+def main():
+    """主函数"""
+    # 打印启动横幅
+    print_banner()
+    
+    # 解析命令行参数（无参数启动时跳过 argparse 的构建开销）
+    if len(sys.argv) == 1:
+        args = DEFAULT_ARGS
+    else:
+        args = parse_args()
     
     # 检查配置文件
     config_path = Path(args.config)
@@ -299,6 +423,9 @@ def main():
         print(f"💡 提示: 请复制 config/config.example.yaml 为 {config_path} 并修改相应设置")
         return 1
     
+    # 在创建任何事件循环之前设置事件循环策略
+    install_event_loop_policy()
+    
     # 创建应用程序实例
     app = PersonaEngineApp(
         config_path=str(config_path),
@@ -306,10 +433,9 @@ def main():
     )
     
     try:
-        # 运行应用程序
-        if sys.platform == "win32":
-            # Windows 需要特殊的事件循环策略
-            asyncio.set_event_loop_policy(asyncio.WindowsProactorEventLoopPolicy())
+        # 运行应用程序（Python 3.8+ 在 Windows 上默认即为 Proactor 事件循环）
+        if app.enable_ui:
+            return app.run_with_ui()
         
         return asyncio.run(app.run())
         
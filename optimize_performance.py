@@ -9,8 +9,16 @@ import sys
 import time
 import psutil
 import gc
+import functools
+import tracemalloc
+import aiofiles
 from pathlib import Path
-from typing import Dict, List, Tuple, Any
+from typing import Dict, List, Tuple, Any, Optional
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
 
 # 添加项目根目录到 Python 路径
 sys.path.append(str(Path(__file__).parent))
@@ -20,11 +28,51 @@ from src.modules.live2d.hiyori_config import HiyoriConfig
 from loguru import logger
 
 
+# 静态硬件信息在进程生命周期内不变，只查询一次
+CPU_COUNT = psutil.cpu_count()
+CPU_FREQ = psutil.cpu_freq()
+
+def get_peak_rss_mb() -> float:
+    """进程峰值常驻内存 (MB)，结束时读取一次"""
+    if resource is None:
+        return psutil.Process().memory_info().peak_wset / (1024**2)
+    
+    # ru_maxrss 在 Linux 上以 KB 为单位，在 macOS 上以字节为单位
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024**2) if sys.platform == "darwin" else peak / 1024
+
+
+# CPU 使用率的采样时长（秒），采样期间让出事件循环
+CPU_SAMPLE_SECONDS = 0.5
+
+# 复用运行中的引擎时，内存分配的采样时长（秒）
+MEMORY_SAMPLE_SECONDS = 2.0
+
+
+@functools.cache
+def get_gpu_info() -> str:
+    """获取 GPU 信息（结果缓存）"""
+    try:
+        import GPUtil
+        gpus = GPUtil.getGPUs()
+        if gpus:
+            gpu = gpus[0]
+            return f"{gpu.name} ({gpu.memoryTotal}MB)"
+        else:
+            return "未检测到 GPU"
+    except ImportError:
+        return "GPU 信息不可用（需要 GPUtil）"
+    except Exception as e:
+        return f"GPU 信息获取失败: {e}"
+
+
 class PerformanceOptimizer:
     """性能优化器"""
     
-    def __init__(self):
-        self.engine = None
+    def __init__(self, engine: Optional[AvatarEngine] = None):
+        # 传入已运行的引擎时直接复用，避免重复加载模型
+        self.engine = engine
+        self._owns_engine = engine is None
         self.config = None
         self.metrics = {}
         
@@ -38,17 +86,15 @@ class PerformanceOptimizer:
         # 内存使用分析
         await self.memory_analysis()
         
-        # Live2D 性能优化
-        await self.optimize_live2d()
-        
-        # 音频性能优化
-        await self.optimize_audio()
-        
-        # 推流性能优化
-        await self.optimize_streaming()
+        # Live2D / 音频 / 推流 优化分析互不依赖，并发执行
+        await asyncio.gather(
+            self.optimize_live2d(),
+            self.optimize_audio(),
+            self.optimize_streaming()
+        )
         
         # 生成优化报告
-        self.generate_optimization_report()
+        await self.generate_optimization_report()
         
         logger.info("✅ 性能优化完成！")
     
@@ -57,15 +103,18 @@ class PerformanceOptimizer:
         logger.info("📊 执行系统性能基准测试...")
         
         # CPU 信息
-        cpu_count = psutil.cpu_count()
-        cpu_freq = psutil.cpu_freq()
-        cpu_percent = psutil.cpu_percent(interval=1)
+        cpu_count = CPU_COUNT
+        cpu_freq = CPU_FREQ
+        # 先开始一次采样，异步等待后读取这段时间内的使用率（interval=None 不阻塞）
+        psutil.cpu_percent(interval=None)
+        await asyncio.sleep(CPU_SAMPLE_SECONDS)
+        cpu_percent = psutil.cpu_percent(interval=None)
         
         # 内存信息
         memory = psutil.virtual_memory()
         
         # GPU 信息（如果可用）
-        gpu_info = self._get_gpu_info()
+        gpu_info = get_gpu_info()
         
         self.metrics['system'] = {
             'cpu_count': cpu_count,
@@ -81,61 +130,88 @@ class PerformanceOptimizer:
         logger.info(f"内存: {memory.total / (1024**3):.1f} GB, 使用率: {memory.percent}%")
         logger.info(f"GPU: {gpu_info}")
     
-    def _get_gpu_info(self) -> str:
-        """获取 GPU 信息"""
-        try:
-            import GPUtil
-            gpus = GPUtil.getGPUs()
-            if gpus:
-                gpu = gpus[0]
-                return f"{gpu.name} ({gpu.memoryTotal}MB)"
-            else:
-                return "未检测到 GPU"
-        except ImportError:
-            return "GPU 信息不可用（需要 GPUtil）"
-        except Exception as e:
-            return f"GPU 信息获取失败: {e}"
-    
     async def memory_analysis(self):
         """内存使用分析"""
         logger.info("🧠 执行内存使用分析...")
         
+        if self.engine is not None:
+            await self._trace_engine_memory()
+            return
+        
         # 创建引擎实例进行内存分析
         config = EngineConfig()
         engine = AvatarEngine(config)
         
-        # 测量初始化前的内存
-        process = psutil.Process()
-        memory_before = process.memory_info().rss / (1024**2)  # MB
-        
-        # 初始化引擎
-        await engine.initialize()
-        
-        # 测量初始化后的内存
-        memory_after = process.memory_info().rss / (1024**2)  # MB
-        memory_used = memory_after - memory_before
+        # 使用 tracemalloc 精确测量 Python 分配，测量过程不产生系统调用；
+        # 每次分配只记录一层调用栈，避免拖慢模型加载、扭曲测量结果
+        tracemalloc.start()
+        try:
+            memory_before = tracemalloc.get_traced_memory()[0] / (1024**2)  # MB
+            
+            # 初始化引擎
+            await engine.initialize()
+            
+            # 测量初始化后的内存
+            memory_after = tracemalloc.get_traced_memory()[0] / (1024**2)  # MB
+            memory_used = memory_after - memory_before
+            
+            # 强制垃圾回收
+            gc.collect()
+            memory_after_gc = tracemalloc.get_traced_memory()[0] / (1024**2)  # MB
+        finally:
+            tracemalloc.stop()
         
-        # 强制垃圾回收
-        gc.collect()
-        memory_after_gc = process.memory_info().rss / (1024**2)  # MB
+        peak_rss = get_peak_rss_mb()
         
         self.metrics['memory'] = {
             'before_init': memory_before,
             'after_init': memory_after,
             'initialization_cost': memory_used,
             'after_gc': memory_after_gc,
-            'gc_freed': memory_after - memory_after_gc
+            'gc_freed': memory_after - memory_after_gc,
+            'peak_rss': peak_rss
         }
         
         logger.info(f"初始化前内存: {memory_before:.1f} MB")
         logger.info(f"初始化后内存: {memory_after:.1f} MB")
         logger.info(f"初始化内存成本: {memory_used:.1f} MB")
         logger.info(f"垃圾回收释放: {memory_after - memory_after_gc:.1f} MB")
+        logger.info(f"进程峰值内存: {peak_rss:.1f} MB")
         
         # 清理引擎
         await engine.cleanup()
         self.engine = engine
     
+    async def _trace_engine_memory(self):
+        """使用 tracemalloc 测量已有引擎运行期间的内存分配"""
+        tracemalloc.start()
+        try:
+            snapshot_before = tracemalloc.take_snapshot()
+            
+            # 只采样，不直接驱动渲染：Live2D 的参数数组、缓冲区和 GL 上下文属于引擎的渲染线程，
+            # 在这里调用 update/render 会与其竞争。等待一段时间，统计引擎自身各线程的分配
+            await asyncio.sleep(MEMORY_SAMPLE_SECONDS)
+            
+            gc.collect()
+            snapshot_after = tracemalloc.take_snapshot()
+            current, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        
+        stats = snapshot_after.compare_to(snapshot_before, 'lineno')
+        allocated = sum(stat.size_diff for stat in stats) / (1024**2)  # MB
+        
+        self.metrics['memory'] = {
+            'sampled_allocated': allocated,
+            'traced_current': current / (1024**2),
+            'traced_peak': peak / (1024**2)
+        }
+        
+        logger.info(f"{MEMORY_SAMPLE_SECONDS:.0f} 秒内内存分配: {allocated:.1f} MB")
+        logger.info(f"跟踪峰值内存: {peak / (1024**2):.1f} MB")
+        for stat in stats[:5]:
+            logger.info(f"  {stat}")
+    
     async def optimize_live2d(self):
         """Live2D 性能优化"""
         logger.info("🎭 执行 Live2D 性能优化...")
@@ -256,62 +332,72 @@ class PerformanceOptimizer:
         for opt in optimizations:
             logger.info(f"💡 优化建议: {opt}")
     
-    def generate_optimization_report(self):
+    async def generate_optimization_report(self):
         """生成优化报告"""
         logger.info("📋 生成优化报告...")
         
         report_path = Path("performance_report.txt")
         
-        with open(report_path, 'w', encoding='utf-8') as f:
-            f.write("虚拟数字人系统性能优化报告\n")
-            f.write("=" * 50 + "\n\n")
-            
-            # 系统信息
-            f.write("系统信息:\n")
-            f.write("-" * 20 + "\n")
-            system_info = self.metrics.get('system', {})
-            for key, value in system_info.items():
-                f.write(f"{key}: {value}\n")
-            f.write("\n")
-            
-            # 内存分析
-            if 'memory' in self.metrics:
-                f.write("内存分析:\n")
-                f.write("-" * 20 + "\n")
-                memory_info = self.metrics['memory']
-                for key, value in memory_info.items():
-                    f.write(f"{key}: {value:.1f} MB\n")
-                f.write("\n")
-            
-            # 各模块优化建议
-            modules = ['live2d', 'audio', 'streaming']
-            for module in modules:
-                if module in self.metrics:
-                    f.write(f"{module.upper()} 模块优化:\n")
-                    f.write("-" * 20 + "\n")
-                    optimizations = self.metrics[module].get('optimizations', [])
-                    if optimizations:
-                        for opt in optimizations:
-                            f.write(f"• {opt}\n")
-                    else:
-                        f.write("无优化建议\n")
-                    f.write("\n")
-            
-            # 总结
-            f.write("总结:\n")
-            f.write("-" * 20 + "\n")
-            f.write("1. 监控内存使用，定期进行垃圾回收\n")
-            f.write("2. 根据实际需求调整 FPS 和分辨率\n")
-            f.write("3. 优化参数数量和表情缓存\n")
-            f.write("4. 确保音频缓冲区设置合理\n")
-            f.write("5. 定期检查推流队列状态\n")
+        lines = [
+            "虚拟数字人系统性能优化报告",
+            "=" * 50,
+            "",
+        ]
+        
+        # 系统信息
+        lines.append("系统信息:")
+        lines.append("-" * 20)
+        system_info = self.metrics.get('system', {})
+        for key, value in system_info.items():
+            lines.append(f"{key}: {value}")
+        lines.append("")
+        
+        # 内存分析
+        if 'memory' in self.metrics:
+            lines.append("内存分析:")
+            lines.append("-" * 20)
+            memory_info = self.metrics['memory']
+            for key, value in memory_info.items():
+                lines.append(f"{key}: {value:.1f} MB")
+            lines.append("")
+        
+        # 各模块优化建议
+        modules = ['live2d', 'audio', 'streaming']
+        for module in modules:
+            if module in self.metrics:
+                lines.append(f"{module.upper()} 模块优化:")
+                lines.append("-" * 20)
+                optimizations = self.metrics[module].get('optimizations', [])
+                if optimizations:
+                    for opt in optimizations:
+                        lines.append(f"• {opt}")
+                else:
+                    lines.append("无优化建议")
+                lines.append("")
+        
+        # 总结
+        lines.extend([
+            "总结:",
+            "-" * 20,
+            "1. 监控内存使用，定期进行垃圾回收",
+            "2. 根据实际需求调整 FPS 和分辨率",
+            "3. 优化参数数量和表情缓存",
+            "4. 确保音频缓冲区设置合理",
+            "5. 定期检查推流队列状态",
+            "",
+        ])
+        
+        # 异步写入，避免阻塞事件循环
+        async with aiofiles.open(report_path, 'w', encoding='utf-8') as f:
+            await f.write("\n".join(lines))
         
         logger.info(f"📄 优化报告已保存到: {report_path}")
     
     async def cleanup(self):
         """清理资源"""
         try:
-            if self.engine:
+            # 外部传入的引擎由调用方负责清理
+            if self.engine and self._owns_engine:
                 await self.engine.cleanup()
             logger.info("🧹 性能优化器清理完成")
         except Exception as e:
@@ -5,30 +5,124 @@ Python Persona Engine 示例脚本
 """
 
 import asyncio
+import functools
+import importlib.util
 import os
 import sys
 import random
-from typing import List, Dict
 import threading
+from functools import partial
+from types import SimpleNamespace
+from typing import List, Dict
 
-# 检查tkinter可用性
-TKINTER_AVAILABLE = False
-try:
-    import tkinter as tk
-    from tkinter import scrolledtext
-    TKINTER_AVAILABLE = True
-except ImportError:
+# 检查tkinter可用性（只查找模块，不导入；命令行模式不会加载 Tk）
+TKINTER_AVAILABLE = (
+    importlib.util.find_spec("tkinter") is not None
+    and importlib.util.find_spec("_tkinter") is not None
+)
+if not TKINTER_AVAILABLE:
     print("⚠️  tkinter 不可用，将使用命令行模式")
-    tk = None
-    scrolledtext = None
 
-# 检查customtkinter可用性
-try:
-    import customtkinter as ctk
-except ImportError:
-    if TKINTER_AVAILABLE:
+
+@functools.cache
+def _load_gui():
+    """首次启动GUI演示时导入 tkinter / customtkinter，并确定使用的控件类"""
+    import tkinter as tk
+    from tkinter import scrolledtext
+    
+    # 检查customtkinter可用性
+    try:
+        import customtkinter as ctk
+    except ImportError:
         print("未安装customtkinter，使用标准tkinter")
-    ctk = None
+        ctk = None
+    
+    if ctk:
+        widgets = SimpleNamespace(
+            Root=ctk.CTk,
+            Frame=ctk.CTkFrame,
+            Label=ctk.CTkLabel,
+            Button=ctk.CTkButton,
+            InputBox=partial(ctk.CTkTextbox, height=80),
+        )
+    else:
+        widgets = SimpleNamespace(
+            Root=tk.Tk,
+            Frame=tk.Frame,
+            Label=tk.Label,
+            Button=tk.Button,
+            InputBox=partial(tk.Text, height=4),
+        )
+    
+    return tk, scrolledtext, widgets
+
+
+# 启动横幅在导入时一次性构建并编码，运行时只需一次写入
+_FEATURES = [
+    ("🗣️ 语音交互", "使用Whisper语音识别和TTS语音合成"),
+    ("🧠 大语言模型", "支持OpenAI, Anthropic, Ollama等"),
+    ("👁️ 视觉感知", "可以看到并理解屏幕内容"),
+    ("😀 Live2D动画", "生动的角色表情和口型同步"),
+    ("🎛️ 控制面板", "直观的图形用户界面"),
+    ("⚙️ 灵活配置", "通过YAML文件轻松配置所有功能"),
+]
+
+FEATURES_BANNER = "\n".join([
+    "",
+    "🎭 Python Persona Engine 功能列表",
+    "=" * 40,
+    *(f"{title}: {desc}" for title, desc in _FEATURES),
+    "",
+    "要启用完整功能，请配置config.yaml文件中的API密钥。",
+    "",
+]).encode("utf-8")
+
+REQUIREMENTS_BANNER = "\n".join([
+    "",
+    "🖥️ 系统要求",
+    "=" * 40,
+    "- Python 3.9+",
+    "- 推荐NVIDIA GPU (用于语音识别、Live2D渲染)",
+    "- 以下系统依赖:",
+    "  • espeak-ng: 用于基本TTS",
+    "  • ffmpeg: 用于音频处理",
+    "",
+    "要安装系统依赖:",
+    "- macOS: brew install espeak-ng ffmpeg",
+    "- Ubuntu/Debian: sudo apt-get install espeak-ng ffmpeg",
+    "- Windows: 请参考QUICKSTART.md中的安装说明",
+    "",
+]).encode("utf-8")
+
+CONSOLE_CHAT_BANNER = "\n".join([
+    "",
+    "=" * 60,
+    "🎭 Python Persona Engine 命令行聊天演示",
+    "=" * 60,
+    "助手: 你好！我是Python Persona Engine的示例角色。",
+    "助手: 请输入消息与我聊天，输入 'quit' 或 'exit' 退出。",
+    "=" * 60,
+    "",
+]).encode("utf-8")
+
+# 演示聊天的预设回复，两种聊天模式共用
+RESPONSES = (
+    "很高兴能和你聊天！",
+    "我是Python Persona Engine的示例角色。我还没有连接到真正的AI引擎。",
+    "如果你想使用完整功能，请配置config.yaml中的API密钥。",
+    "我可以模拟对话、语音识别和文本转语音等功能。",
+    "这只是个简单演示，完整引擎支持Live2D角色动画！",
+    "有关如何设置和使用的详细信息，请查看README.md。",
+    "你可以使用OpenAI、Anthropic或本地的LLM模型作为我的大脑。",
+)
+
+# 演示专用的随机数生成器，选择回复时直接调用绑定方法
+choose_response = random.Random().choice
+
+THINKING_PROMPT = "助手: [思考中...]"
+
+# 回到行首并清除整行（ANSI），非终端输出时只回到行首
+ERASE_LINE = "\r\x1b[2K" if sys.stdout.isatty() else "\r"
 
 
 def simple_text_chat():
@@ -36,29 +130,20 @@ def simple_text_chat():
     
     if not TKINTER_AVAILABLE:
         # 使用命令行模式
-        return simple_console_chat()
+        return run_console_chat()
     
-    # 预设回复
-    responses = [
-        "很高兴能和你聊天！",
-        "我是Python Persona Engine的示例角色。我还没有连接到真正的AI引擎。",
-        "如果你想使用完整功能，请配置config.yaml中的API密钥。",
-        "我可以模拟对话、语音识别和文本转语音等功能。",
-        "这只是个简单演示，完整引擎支持Live2D角色动画！",
-        "有关如何设置和使用的详细信息，请查看README.md。",
-        "你可以使用OpenAI、Anthropic或本地的LLM模型作为我的大脑。"
-    ]
+    tk, scrolledtext, W = _load_gui()
     
     # 创建简单UI
-    root = ctk.CTk() if ctk else tk.Tk()
+    root = W.Root()
     root.title("Python Persona Engine 演示")
     root.geometry("600x800")
     
-    frame = ctk.CTkFrame(root) if ctk else tk.Frame(root)
+    frame = W.Frame(root)
     frame.pack(fill=tk.BOTH, expand=True, padx=20, pady=20)
     
     # 对话区域
-    chat_label = ctk.CTkLabel(frame, text="聊天记录") if ctk else tk.Label(frame, text="聊天记录")
+    chat_label = W.Label(frame, text="聊天记录")
     chat_label.pack(pady=(0, 5), anchor="w")
     
     chat_area = scrolledtext.ScrolledText(frame, wrap=tk.WORD, height=20)
@@ -67,18 +152,33 @@ def simple_text_chat():
     chat_area.config(state=tk.DISABLED)
     
     # 输入区域
-    input_label = ctk.CTkLabel(frame, text="输入消息") if ctk else tk.Label(frame, text="输入消息")
+    input_label = W.Label(frame, text="输入消息")
     input_label.pack(pady=(0, 5), anchor="w")
     
-    input_area = ctk.CTkTextbox(frame, height=80) if ctk else tk.Text(frame, height=4)
+    input_area = W.InputBox(frame)
     input_area.pack(fill=tk.X, pady=(0, 10))
     
     # 状态区域
     status_var = tk.StringVar()
     status_var.set("准备就绪")
-    status_label = ctk.CTkLabel(frame, textvariable=status_var) if ctk else tk.Label(frame, textvariable=status_var)
+    status_label = W.Label(frame, textvariable=status_var)
     status_label.pack(pady=5)
     
+    # 待写入聊天区的文本，在同一个空闲周期内合并为一次插入和滚动
+    pending_lines: List[str] = []
+    
+    def flush_chat():
+        chat_area.config(state=tk.NORMAL)
+        chat_area.insert(tk.END, "".join(pending_lines))
+        chat_area.see(tk.END)
+        chat_area.config(state=tk.DISABLED)
+        pending_lines.clear()
+    
+    def append_line(text: str):
+        if not pending_lines:
+            root.after_idle(flush_chat)
+        pending_lines.append(text)
+    
     # 发送函数
     def send_message():
         msg = input_area.get("1.0", tk.END).strip()
@@ -90,38 +190,32 @@ def simple_text_chat():
         status_var.set("思考中...")
         
         # 更新聊天记录
-        chat_area.config(state=tk.NORMAL)
-        chat_area.insert(tk.END, f"用户: {msg}\n\n")
-        chat_area.see(tk.END)
-        chat_area.config(state=tk.DISABLED)
+        append_line(f"用户: {msg}\n\n")
         
         # 清空输入
         input_area.delete("1.0", tk.END)
         
         # 模拟处理延迟
         def delayed_response():
-            response = random.choice(responses)
+            response = choose_response(RESPONSES)
             
-            chat_area.config(state=tk.NORMAL)
-            chat_area.insert(tk.END, f"助手: {response}\n\n")
-            chat_area.see(tk.END)
-            chat_area.config(state=tk.DISABLED)
+            append_line(f"助手: {response}\n\n")
             
             status_var.set("准备就绪")
             input_area.config(state=tk.NORMAL)
             input_area.focus()
             
-        # 模拟延迟
-        threading.Timer(1.0, delayed_response).start()
+        # 模拟延迟（通过 Tk 事件循环调度，保证控件只在主线程中修改）
+        root.after(1000, delayed_response)
     
     # 按钮
-    button_frame = ctk.CTkFrame(frame) if ctk else tk.Frame(frame)
+    button_frame = W.Frame(frame)
     button_frame.pack(fill=tk.X, pady=10)
     
-    send_button = ctk.CTkButton(button_frame, text="发送", command=send_message) if ctk else tk.Button(button_frame, text="发送", command=send_message)
+    send_button = W.Button(button_frame, text="发送", command=send_message)
     send_button.pack(side=tk.RIGHT)
     
-    quit_button = ctk.CTkButton(button_frame, text="退出", command=root.destroy) if ctk else tk.Button(button_frame, text="退出", command=root.destroy)
+    quit_button = W.Button(button_frame, text="退出", command=root.destroy)
     quit_button.pack(side=tk.LEFT)
     
     # 绑定回车键
@@ -130,31 +224,46 @@ def simple_text_chat():
     root.mainloop()
 
 
-def simple_console_chat():
-    """命令行聊天演示"""
+async def _async_input(prompt: str) -> str:
+    """在守护线程中读取输入，不阻塞事件循环，也不妨碍 Ctrl+C 退出"""
+    loop = asyncio.get_running_loop()
+    future = loop.create_future()
     
-    # 预设回复
-    responses = [
-        "很高兴能和你聊天！",
-        "我是Python Persona Engine的示例角色。我还没有连接到真正的AI引擎。",
-        "如果你想使用完整功能，请配置config.yaml中的API密钥。",
-        "我可以模拟对话、语音识别和文本转语音等功能。",
-        "这只是个简单演示，完整引擎支持Live2D角色动画！",
-        "有关如何设置和使用的详细信息，请查看README.md。",
-        "你可以使用OpenAI、Anthropic或本地的LLM模型作为我的大脑。"
-    ]
+    def deliver(setter, value):
+        if not future.done():
+            setter(value)
     
-    print("\n" + "="*60)
-    print("🎭 Python Persona Engine 命令行聊天演示")
-    print("="*60)
-    print("助手: 你好！我是Python Persona Engine的示例角色。")
-    print("助手: 请输入消息与我聊天，输入 'quit' 或 'exit' 退出。")
-    print("="*60)
+    def read():
+        try:
+            # 直接读取无缓冲的底层流，不持有 stdin 缓冲锁，解释器退出时不会被守护线程卡住
+            line = sys.stdin.buffer.raw.readline()
+            if not line:
+                raise EOFError
+            result = line.decode(sys.stdin.encoding or "utf-8").rstrip("\r\n")
+        except Exception as e:
+            callback = (deliver, future.set_exception, e)
+        else:
+            callback = (deliver, future.set_result, result)
+        try:
+            loop.call_soon_threadsafe(*callback)
+        except RuntimeError:
+            # 事件循环已关闭
+            pass
+    
+    print(prompt, end="", flush=True)
+    threading.Thread(target=read, name="console-input", daemon=True).start()
+    return await future
+
+
+async def simple_console_chat():
+    """命令行聊天演示"""
+    
+    _write_banner(CONSOLE_CHAT_BANNER)
     
     while True:
         try:
             # 获取用户输入
-            user_input = input("\n用户: ").strip()
+            user_input = (await _async_input("\n用户: ")).strip()
             
             # 检查退出命令
             if user_input.lower() in ['quit', 'exit', '退出', 'q']:
@@ -165,56 +274,43 @@ def simple_console_chat():
                 continue
             
             # 模拟思考延迟
-            print("助手: [思考中...]", end="", flush=True)
-            import time
-            time.sleep(1)
-            print("\r", end="")  # 清除思考提示
+            sys.stdout.write(THINKING_PROMPT)
+            sys.stdout.flush()
+            await asyncio.sleep(1)
             
-            # 随机选择回复
-            response = random.choice(responses)
-            print(f"助手: {response}")
+            # 随机选择回复，清除思考提示后一次写出
+            response = choose_response(RESPONSES)
+            sys.stdout.write(f"{ERASE_LINE}助手: {response}\n")
+            sys.stdout.flush()
             
-        except KeyboardInterrupt:
-            print("\n\n助手: 再见！感谢使用 Python Persona Engine！")
-            break
         except EOFError:
             print("\n\n助手: 再见！感谢使用 Python Persona Engine！")
             break
 
 
+def run_console_chat():
+    """运行命令行聊天演示"""
+    try:
+        asyncio.run(simple_console_chat())
+    except KeyboardInterrupt:
+        print("\n\n助手: 再见！感谢使用 Python Persona Engine！")
+
+
+def _write_banner(banner: bytes):
+    """一次性写出预编码的横幅文本"""
+    sys.stdout.flush()
+    sys.stdout.buffer.write(banner)
+    sys.stdout.flush()
+
+
 def show_features():
     """展示功能列表"""
-    print("\n🎭 Python Persona Engine 功能列表")
-    print("=" * 40)
-    
-    features = [
-        ("🗣️ 语音交互", "使用Whisper语音识别和TTS语音合成"),
-        ("🧠 大语言模型", "支持OpenAI, Anthropic, Ollama等"),
-        ("👁️ 视觉感知", "可以看到并理解屏幕内容"),
-        ("😀 Live2D动画", "生动的角色表情和口型同步"),
-        ("🎛️ 控制面板", "直观的图形用户界面"),
-        ("⚙️ 灵活配置", "通过YAML文件轻松配置所有功能"),
-    ]
-    
-    for title, desc in features:
-        print(f"{title}: {desc}")
-    
-    print("\n要启用完整功能，请配置config.yaml文件中的API密钥。")
+    _write_banner(FEATURES_BANNER)
 
 
 def print_requirements():
     """打印系统要求"""
-    print("\n🖥️ 系统要求")
-    print("=" * 40)
-    print("- Python 3.9+")
-    print("- 推荐NVIDIA GPU (用于语音识别、Live2D渲染)")
-    print("- 以下系统依赖:")
-    print("  • espeak-ng: 用于基本TTS")
-    print("  • ffmpeg: 用于音频处理")
-    print("\n要安装系统依赖:")
-    print("- macOS: brew install espeak-ng ffmpeg")
-    print("- Ubuntu/Debian: sudo apt-get install espeak-ng ffmpeg")
-    print("- Windows: 请参考QUICKSTART.md中的安装说明")
+    _write_banner(REQUIREMENTS_BANNER)
 
 
 def main():
@@ -251,7 +347,7 @@ def main():
     # 如果没有tkinter或指定了命令行模式，使用命令行聊天
     if not TKINTER_AVAILABLE or console_mode:
         print("\n启动命令行聊天演示...")
-        simple_console_chat()
+        run_console_chat()
     else:
         # 运行GUI演示
         print("\n启动GUI聊天演示界面...")
@@ -5,23 +5,42 @@ Virtual Avatar Engine - 虚拟数字人核心引擎
 """
 
 import asyncio
-import logging
+import os
+import platform
+import sys
 import threading
-from typing import Optional, Dict, Any, Callable
+from typing import Optional, Dict, Any, Callable, TYPE_CHECKING
 from dataclasses import dataclass
 from enum import Enum
 import time
+import numpy as np
+from loguru import logger
 
-from .conversation_manager import ConversationManager
+# Arm CPU 上的 PyTorch 运行时设置（oneDNN BF16 矩阵运算、大页内存、算子缓存、线程数），
+# 必须在导入 torch 之前设置；已有的环境变量不覆盖
+if platform.machine().lower() in ("aarch64", "arm64"):
+    os.environ.setdefault("DNNL_DEFAULT_FPMATH_MODE", "BF16")
+    os.environ.setdefault("THP_MEM_ALLOC_ENABLE", "1")
+    os.environ.setdefault("LRU_CACHE_CAPACITY", "1024")
+    os.environ.setdefault("OMP_NUM_THREADS", str(os.cpu_count() or 4))
+
+from .conversation_manager import ConversationManager, ConversationTurn
 from .config_manager import ConfigManager
-from ..modules.live2d.live2d_manager import Live2DManager
 from ..modules.asr.whisper_asr import WhisperASR
 from ..modules.tts.tts_engine import TTSEngine
 from ..modules.llm.llm_client import LLMClient
+from ..modules.llm.llm_cache import LLMCache, SemanticLLMCache
 from ..modules.audio.audio_manager import AudioManager
 from ..rendering.spout_streamer import SpoutStreamer
 from ..ui.control_panel import ControlPanel
 
+if TYPE_CHECKING:
+    from ..modules.live2d.live2d_manager import Live2DManager
+
+
+# 麦克风音频块队列上限（约 2 秒的 1024 帧块），对话处理跟不上时丢弃最旧的音频
+AUDIO_CHUNK_QUEUE_SIZE = 32
+
 
 class EngineState(Enum):
     """引擎状态枚举"""
@@ -31,7 +50,7 @@ class EngineState(Enum):
     ERROR = "error"
 
 
-@dataclass
+@dataclass(frozen=True)
 class EngineConfig:
     """引擎配置"""
     # Live2D 配置
@@ -45,16 +64,27 @@ class EngineConfig:
     
     # ASR 配置
     whisper_model: str = "base"
+    asr_backend: str = "faster_whisper"  # faster_whisper (CTranslate2 INT8), whisper (PyTorch)
+    asr_quantization: str = "int8_dynamic"  # whisper 后端在 CPU 上的量化：int8_dynamic, none
+    vad_backend: str = "onnx"  # Silero VAD 推理后端：onnx (ONNX Runtime, CPU), torch
     vad_threshold: float = 0.5
     
     # TTS 配置
     tts_voice: str = "default"
     tts_speed: float = 1.0
+    tts_cache_dir: Optional[str] = "resources/cache/tts"
+    tts_cache_max_mb: float = 256.0
     
     # LLM 配置
     llm_model: str = "gpt-3.5-turbo"
     llm_api_key: str = ""
     llm_endpoint: str = "https://api.openai.com/v1"
+    llm_persist_session: bool = True
+    llm_session_path: str = "resources/cache/llm_session.json"
+    llm_semantic_cache: bool = True
+    llm_semantic_cache_threshold: float = 0.92
+    llm_semantic_cache_entries: int = 512
+    llm_semantic_cache_path: str = "resources/cache/semantic_cache.npz"
     
     # 推流配置
     enable_obs_streaming: bool = True
@@ -66,6 +96,60 @@ class EngineConfig:
     render_width: int = 1080
     render_height: int = 1920
     target_fps: int = 60
+    
+    # 是否用 numba 编译 Live2D 帧计算内核，关闭后跳过启动时的编译预热
+    enable_jit: bool = True
+
+
+class LatencyMetrics:
+    """
+    对话延迟统计
+    
+    每项延迟各占一个预分配的 float32 环形数组，保存最近 window 轮的数值（秒），
+    汇总时向量化计算中位数和 p95
+    """
+    
+    __slots__ = ("asr", "llm", "tts", "first_audio", "total", "count")
+    
+    FIELDS = ("asr", "llm", "tts", "first_audio", "total")
+    
+    def __init__(self, window: int = 256):
+        self.asr = np.zeros(window, dtype=np.float32)
+        self.llm = np.zeros(window, dtype=np.float32)
+        self.tts = np.zeros(window, dtype=np.float32)
+        self.first_audio = np.zeros(window, dtype=np.float32)
+        self.total = np.zeros(window, dtype=np.float32)
+        self.count = 0
+    
+    def record(self, turn: ConversationTurn):
+        """记录一轮对话的各项延迟"""
+        index = self.count % len(self.total)
+        self.asr[index] = turn.asr_latency
+        self.llm[index] = turn.llm_latency
+        self.tts[index] = turn.tts_latency
+        self.first_audio[index] = turn.first_audio_latency
+        self.total[index] = turn.total_latency
+        self.count += 1
+    
+    def summary(self) -> Dict[str, Any]:
+        """最近一轮的延迟以及窗口内的 p50/p95（毫秒）"""
+        window = len(self.total)
+        size = min(self.count, window)
+        last = (self.count - 1) % window
+        
+        result: Dict[str, Any] = {"interactions_count": self.count}
+        for name in self.FIELDS:
+            values = getattr(self, name)[:size]
+            if size:
+                p50, p95 = np.percentile(values, (50, 95)) * 1000.0
+                result[f"{name}_latency"] = float(values[last]) * 1000.0
+            else:
+                p50 = p95 = 0.0
+                result[f"{name}_latency"] = 0.0
+            result[f"{name}_p50"] = float(p50)
+            result[f"{name}_p95"] = float(p95)
+        
+        return result
 
 
 class AvatarEngine:
@@ -83,22 +167,27 @@ class AvatarEngine:
     def __init__(self, config: Optional[EngineConfig] = None):
         self.config = config or EngineConfig()
         self.state = EngineState.STOPPED
-        self.logger = logging.getLogger(__name__)
+        self._state_value = self.state.value
+        self.logger = logger.bind(component="AvatarEngine")
         
         # 核心组件
         self.config_manager: Optional[ConfigManager] = None
         self.conversation_manager: Optional[ConversationManager] = None
-        self.live2d_manager: Optional[Live2DManager] = None
+        self.live2d_manager: Optional["Live2DManager"] = None
         self.asr: Optional[WhisperASR] = None
         self.tts: Optional[TTSEngine] = None
-        self.llm: Optional[LLMClient] = None
+        self.llm: Optional[SemanticLLMCache] = None
         self.audio_manager: Optional[AudioManager] = None
         self.spout_streamer: Optional[SpoutStreamer] = None
         self.control_panel: Optional[ControlPanel] = None
         
+        # 对话延迟统计
+        self.metrics = LatencyMetrics()
+        
         # 内部状态
         self._render_thread: Optional[threading.Thread] = None
-        self._audio_thread: Optional[threading.Thread] = None
+        self._jit_warmup_thread: Optional[threading.Thread] = None
+        self._audio_task: Optional[asyncio.Task] = None
         self._conversation_task: Optional[asyncio.Task] = None
         self._running = False
         self._loop: Optional[asyncio.AbstractEventLoop] = None
@@ -124,49 +213,27 @@ class AvatarEngine:
             self.config_manager = ConfigManager()
             await self.config_manager.load_config()
             
-            # 初始化 Live2D 管理器
-            self.logger.info("初始化 Live2D 管理器...")
-            self.live2d_manager = Live2DManager(
-                model_path=self.config.live2d_model_path,
-                model_name=self.config.live2d_model_name,
-                width=self.config.render_width,
-                height=self.config.render_height
-            )
-            await self.live2d_manager.initialize()
-            
-            # 初始化音频管理器
-            self.logger.info("初始化音频管理器...")
-            self.audio_manager = AudioManager(
-                sample_rate=self.config.sample_rate,
-                chunk_size=self.config.chunk_size,
-                device_index=self.config.audio_device_index
-            )
-            await self.audio_manager.initialize()
-            
-            # 初始化 ASR
-            self.logger.info("初始化语音识别...")
-            self.asr = WhisperASR(
-                model_name=self.config.whisper_model,
-                vad_threshold=self.config.vad_threshold
-            )
-            await self.asr.initialize()
+            # 内核在 Live2D 模块导入时决定是否编译，须先写入环境变量
+            if not self.config.enable_jit:
+                os.environ["PERSONA_JIT"] = "0"
             
-            # 初始化 TTS
-            self.logger.info("初始化语音合成...")
-            self.tts = TTSEngine(
-                voice=self.config.tts_voice,
-                speed=self.config.tts_speed
+            # 后台预热 Live2D 帧计算内核，编译与后续模型加载并行进行
+            self._jit_warmup_thread = threading.Thread(
+                target=self._warmup_kernels, name="jit-warmup", daemon=True
             )
-            await self.tts.initialize()
-            
-            # 初始化 LLM
-            self.logger.info("初始化大语言模型...")
-            self.llm = LLMClient(
-                model=self.config.llm_model,
-                api_key=self.config.llm_api_key,
-                endpoint=self.config.llm_endpoint
-            )
-            await self.llm.initialize()
+            self._jit_warmup_thread.start()
+            
+            # 各子系统互不依赖，模型加载和设备初始化并发进行
+            init_steps = [
+                self._init_live2d(),
+                self._init_audio(),
+                self._init_asr(),
+                self._init_tts(),
+                self._init_llm(),
+            ]
+            if self.config.enable_obs_streaming:
+                init_steps.append(self._init_streamer())
+            await asyncio.gather(*init_steps)
             
             # 初始化对话管理器
             self.logger.info("初始化对话管理器...")
@@ -176,16 +243,7 @@ class AvatarEngine:
                 llm=self.llm,
                 live2d_manager=self.live2d_manager
             )
-            
-            # 初始化推流器
-            if self.config.enable_obs_streaming:
-                self.logger.info("初始化 OBS 推流...")
-                self.spout_streamer = SpoutStreamer(
-                    host=self.config.obs_host,
-                    port=self.config.obs_port,
-                    password=self.config.obs_password
-                )
-                await self.spout_streamer.initialize()
+            self.conversation_manager.on_turn_completed = self.metrics.record
             
             # 初始化控制面板
             self.logger.info("初始化控制面板...")
@@ -201,6 +259,85 @@ class AvatarEngine:
                 self.on_error(e)
             return False
     
+    async def _init_live2d(self):
+        """初始化 Live2D 管理器"""
+        from ..modules.live2d.live2d_manager import Live2DManager
+        
+        self.logger.info("初始化 Live2D 管理器...")
+        self.live2d_manager = Live2DManager(
+            model_path=self.config.live2d_model_path,
+            model_name=self.config.live2d_model_name,
+            width=self.config.render_width,
+            height=self.config.render_height
+        )
+        await self.live2d_manager.initialize()
+    
+    async def _init_audio(self):
+        """初始化音频管理器"""
+        self.logger.info("初始化音频管理器...")
+        self.audio_manager = AudioManager(
+            sample_rate=self.config.sample_rate,
+            chunk_size=self.config.chunk_size,
+            device_index=self.config.audio_device_index
+        )
+        await self.audio_manager.initialize()
+    
+    async def _init_asr(self):
+        """初始化语音识别"""
+        self.logger.info("初始化语音识别...")
+        self.asr = WhisperASR(
+            model_name=self.config.whisper_model,
+            vad_threshold=self.config.vad_threshold,
+            backend=self.config.asr_backend,
+            quantization=self.config.asr_quantization,
+            vad_backend=self.config.vad_backend
+        )
+        await self.asr.initialize()
+    
+    async def _init_tts(self):
+        """初始化语音合成"""
+        self.logger.info("初始化语音合成...")
+        self.tts = TTSEngine(
+            voice=self.config.tts_voice,
+            speed=self.config.tts_speed,
+            cache_dir=self.config.tts_cache_dir,
+            cache_max_mb=self.config.tts_cache_max_mb
+        )
+        await self.tts.initialize()
+    
+    async def _init_llm(self):
+        """初始化大语言模型及其缓存"""
+        self.logger.info("初始化大语言模型...")
+        self.llm = SemanticLLMCache(
+            LLMCache(
+                LLMClient(
+                    model=self.config.llm_model,
+                    api_key=self.config.llm_api_key,
+                    endpoint=self.config.llm_endpoint
+                ),
+                ttl_seconds=3600
+            ),
+            threshold=self.config.llm_semantic_cache_threshold,
+            max_entries=self.config.llm_semantic_cache_entries,
+            enabled=self.config.llm_semantic_cache
+        )
+        await self.llm.initialize()
+        if self.config.llm_persist_session:
+            self.llm.load_session(self.config.llm_session_path)
+        if self.config.llm_semantic_cache:
+            await asyncio.to_thread(self.llm.load, self.config.llm_semantic_cache_path)
+            await self.llm.load_encoder()
+    
+    async def _init_streamer(self):
+        """初始化 OBS 推流"""
+        self.logger.info("初始化 OBS 推流...")
+        self.spout_streamer = SpoutStreamer(
+            host=self.config.obs_host,
+            port=self.config.obs_port,
+            password=self.config.obs_password
+        )
+        await self.spout_streamer.initialize()
+    
     async def start(self) -> bool:
         """
         启动引擎
@@ -217,13 +354,18 @@ class AvatarEngine:
             self._running = True
             self._loop = asyncio.get_event_loop()
             
+            # 等待内核预热完成，避免首帧阻塞在编译上
+            if self._jit_warmup_thread:
+                await asyncio.to_thread(self._jit_warmup_thread.join)
+                self._jit_warmup_thread = None
+            
             # 启动渲染线程
             self._render_thread = threading.Thread(target=self._render_loop, daemon=True)
             self._render_thread.start()
             
-            # 启动音频处理线程
-            self._audio_thread = threading.Thread(target=self._audio_loop, daemon=True)
-            self._audio_thread.start()
+            # 启动音频处理任务
+            if self.audio_manager and self.conversation_manager:
+                self._audio_task = asyncio.create_task(self._audio_consume())
             
             # 启动对话管理器
             self._conversation_task = asyncio.create_task(
@@ -263,6 +405,15 @@ class AvatarEngine:
                 except asyncio.CancelledError:
                     pass
             
+            # 停止音频处理
+            if self._audio_task:
+                self._audio_task.cancel()
+                try:
+                    await self._audio_task
+                except asyncio.CancelledError:
+                    pass
+                self._audio_task = None
+            
             # 停止推流
             if self.spout_streamer:
                 await self.spout_streamer.stop_streaming()
@@ -275,9 +426,6 @@ class AvatarEngine:
             if self._render_thread and self._render_thread.is_alive():
                 self._render_thread.join(timeout=5.0)
             
-            if self._audio_thread and self._audio_thread.is_alive():
-                self._audio_thread.join(timeout=5.0)
-            
             # 清理资源
             await self._cleanup()
             
@@ -289,51 +437,97 @@ class AvatarEngine:
             if self.on_error:
                 self.on_error(e)
     
+    def _warmup_kernels(self):
+        """预热 Live2D 帧计算内核（在独立线程中运行）"""
+        try:
+            from ..modules.live2d import live2d_kernels
+            
+            if not live2d_kernels.JIT_ENABLED:
+                return
+            
+            start_time = time.monotonic()
+            live2d_kernels.warmup()
+            self.logger.info(f"Live2D 计算内核预热完成，用时 {time.monotonic() - start_time:.2f}s")
+        except Exception as e:
+            self.logger.warning(f"Live2D 计算内核预热失败: {e}")
+    
     def _render_loop(self):
         """渲染循环（在独立线程中运行）"""
         target_frame_time = 1.0 / self.config.target_fps
         
-        while self._running:
-            start_time = time.time()
-            
+        # Windows 默认计时器精度约 15ms，渲染期间提升到 1ms
+        winmm = None
+        if sys.platform == "win32":
             try:
-                # 更新 Live2D 模型
-                if self.live2d_manager:
-                    delta_time = target_frame_time
-                    self.live2d_manager.update(delta_time)
-                    frame = self.live2d_manager.render()
-                    
-                    # 发送帧到推流器
-                    if self.spout_streamer and frame is not None:
-                        self.spout_streamer.send_frame(frame)
-                
+                import ctypes
+                winmm = ctypes.WinDLL("winmm")
+                winmm.timeBeginPeriod(1)
             except Exception as e:
-                self.logger.error(f"渲染循环错误: {e}")
-            
-            # 控制帧率
-            elapsed = time.time() - start_time
-            if elapsed < target_frame_time:
-                time.sleep(target_frame_time - elapsed)
+                self.logger.warning(f"设置计时器精度失败: {e}")
+                winmm = None
+        
+        try:
+            self._render_frames(target_frame_time)
+        finally:
+            if winmm:
+                winmm.timeEndPeriod(1)
     
-    def _audio_loop(self):
-        """音频处理循环（在独立线程中运行）"""
+    def _render_frames(self, target_frame_time: float):
+        """按绝对截止时间逐帧渲染，帧间隔不累积误差"""
+        # 循环内只访问局部变量
+        live2d = self.live2d_manager
+        streamer = self.spout_streamer
+        log = self.logger
+        monotonic = time.monotonic
+        sleep = time.sleep
+        
+        next_deadline = monotonic()
+        
         while self._running:
             try:
-                if self.audio_manager and self.conversation_manager:
-                    # 获取音频数据
-                    audio_data = self.audio_manager.get_audio_chunk()
-                    if audio_data is not None:
-                        # 异步处理音频
-                        if self._loop:
-                            asyncio.run_coroutine_threadsafe(
-                                self.conversation_manager.process_audio(audio_data),
-                                self._loop
-                            )
+                # 更新 Live2D 模型
+                if live2d:
+                    live2d.update(target_frame_time)
+                    
+                    if streamer and streamer.streaming:
+                        # 直接渲染到推流器的帧缓冲区，推流后由推流器回收复用
+                        buffer = streamer.acquire_frame_buffer(live2d.height, live2d.width)
+                        frame = live2d.render(out=buffer)
+                        if frame is not None:
+                            streamer.send_frame(frame)
+                        else:
+                            streamer.release_frame_buffer(buffer)
+                    else:
+                        live2d.render()
                 
-            except Exception as e:
-                self.logger.error(f"音频处理循环错误: {e}")
-            
-            time.sleep(0.01)  # 10ms 间隔
+            except Exception:
+                # 异常信息只在日志实际输出时才格式化
+                log.opt(exception=True).error("渲染循环错误")
+            
+            # 控制帧率：睡到下一帧的截止时间，落后时从当前时间重新计时
+            next_deadline += target_frame_time
+            delay = next_deadline - monotonic()
+            if delay > 0:
+                sleep(delay)
+            else:
+                next_deadline = monotonic()
+    
+    async def _audio_consume(self):
+        """音频处理任务：等待输入回调投递的音频块，没有数据时不占用 CPU"""
+        chunk_queue = self.audio_manager.subscribe_chunks(
+            asyncio.get_running_loop(), maxsize=AUDIO_CHUNK_QUEUE_SIZE
+        )
+        log = self.logger
+        process_audio = self.conversation_manager.process_audio
+        try:
+            while self._running:
+                audio_data = await chunk_queue.get()
+                try:
+                    await process_audio(audio_data)
+                except Exception:
+                    log.opt(exception=True).error("音频处理错误")
+        finally:
+            self.audio_manager.unsubscribe_chunks(chunk_queue)
     
     async def _cleanup(self):
         """清理资源"""
@@ -351,6 +545,10 @@ class AvatarEngine:
                 await self.tts.cleanup()
             
             if self.llm:
+                if self.config.llm_persist_session:
+                    self.llm.save_session(self.config.llm_session_path)
+                if self.config.llm_semantic_cache:
+                    await asyncio.to_thread(self.llm.save, self.config.llm_semantic_cache_path)
                 await self.llm.cleanup()
             
             if self.spout_streamer:
@@ -363,11 +561,17 @@ class AvatarEngine:
         """设置引擎状态"""
         if self.state != new_state:
             self.state = new_state
+            self._state_value = new_state.value
             self.logger.info(f"引擎状态变更: {new_state.value}")
             if self.on_state_changed:
                 self.on_state_changed(new_state)
     
     # 公共接口方法
+    @property
+    def state_value(self) -> str:
+        """当前状态的字符串值（状态变更时缓存，读取不经过枚举）"""
+        return self._state_value
+    
     async def send_message(self, message: str) -> str:
         """
         发送消息给虚拟人
@@ -400,16 +604,27 @@ class AvatarEngine:
             Dict[str, Any]: 包含各子系统状态的字典
         """
         return {
-            "engine_state": self.state.value,
+            "engine_state": self._state_value,
             "live2d_initialized": self.live2d_manager is not None,
             "audio_initialized": self.audio_manager is not None,
             "asr_initialized": self.asr is not None,
             "tts_initialized": self.tts is not None,
             "llm_initialized": self.llm is not None,
+            "llm_cache": dict(self.llm.cache_stats) if self.llm else None,
+            "llm_semantic_cache": dict(self.llm.semantic_stats) if self.llm else None,
             "streaming_enabled": self.spout_streamer is not None,
             "running": self._running
         }
     
+    def get_metrics(self) -> Dict[str, Any]:
+        """
+        获取对话延迟指标
+        
+        Returns:
+            Dict[str, Any]: 最近一轮和 p50/p95 延迟（毫秒）及交互次数
+        """
+        return self.metrics.summary()
+    
     async def update_config(self, new_config: Dict[str, Any]):
         """
         更新配置
@@ -3,11 +3,22 @@
 负责加载和管理系统配置
 """
 
+import hashlib
 import os
+import pickle
 import yaml
 from typing import Dict, Any, Optional
 from pathlib import Path
 
+# 优先使用 libyaml 的 C 解析器
+try:
+    from yaml import CSafeLoader as YamlLoader
+except ImportError:
+    from yaml import SafeLoader as YamlLoader
+
+# 解析后的配置缓存目录，配置文件未修改时跳过 YAML 解析
+CONFIG_CACHE_DIR = Path.home() / ".cache" / "parrot_engine"
+
 class ConfigManager:
     """配置管理器类"""
     
@@ -20,6 +31,8 @@ class ConfigManager:
         """
         self.config_file = config_file
         self.config = {}
+        # 点号分隔键到配置值的扁平索引，set 时置空，下次 get 时重建
+        self._flat: Optional[Dict[str, Any]] = None
         self.load_config()
     
     def load_config(self) -> None:
@@ -27,14 +40,65 @@ class ConfigManager:
         try:
             config_path = Path(self.config_file)
             if config_path.exists():
-                with open(config_path, 'r', encoding='utf-8') as f:
-                    self.config = yaml.safe_load(f) or {}
+                self.config = self._load_yaml_cached(config_path)
             else:
                 print(f"配置文件 {self.config_file} 不存在，使用默认配置")
                 self.config = self.get_default_config()
         except Exception as e:
             print(f"加载配置文件失败: {e}")
             self.config = self.get_default_config()
+        
+        self._flat = None
+    
+    def _load_yaml_cached(self, config_path: Path) -> Dict[str, Any]:
+        """
+        解析 YAML 配置，文件的修改时间和大小未变时直接读取上次的解析结果
+        
+        Args:
+            config_path: 配置文件路径
+            
+        Returns:
+            配置字典
+        """
+        stat = config_path.stat()
+        signature = (stat.st_mtime_ns, stat.st_size)
+        path_key = hashlib.sha1(str(config_path.resolve()).encode("utf-8")).hexdigest()
+        cache_path = CONFIG_CACHE_DIR / f"config-{path_key}.pkl"
+        
+        try:
+            with open(cache_path, 'rb') as f:
+                cached_signature, config = pickle.load(f)
+            if cached_signature == signature:
+                return config
+        except Exception:
+            pass
+        
+        with open(config_path, 'r', encoding='utf-8') as f:
+            config = yaml.load(f, Loader=YamlLoader) or {}
+        
+        try:
+            CONFIG_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+            with open(cache_path, 'wb') as f:
+                pickle.dump((signature, config), f, protocol=pickle.HIGHEST_PROTOCOL)
+        except Exception as e:
+            print(f"写入配置缓存失败: {e}")
+        
+        return config
+    
+    @staticmethod
+    def _flatten(config: Dict[str, Any], prefix: str = "",
+                 flat: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """将嵌套配置展开为点号分隔键的字典（中间层级也保留）"""
+        if flat is None:
+            flat = {}
+        
+        for k, v in config.items():
+            key = f"{prefix}{k}"
+            flat[key] = v
+            if isinstance(v, dict):
+                ConfigManager._flatten(v, key + ".", flat)
+        
+        return flat
     
     def get_default_config(self) -> Dict[str, Any]:
         """获取默认配置"""
@@ -88,15 +152,10 @@ class ConfigManager:
         Returns:
             配置值
         """
-        keys = key.split('.')
-        value = self.config
+        if self._flat is None:
+            self._flat = self._flatten(self.config)
         
-        try:
-            for k in keys:
-                value = value[k]
-            return value
-        except (KeyError, TypeError):
-            return default
+        return self._flat.get(key, default)
     
     def set(self, key: str, value: Any) -> None:
         """
@@ -115,6 +174,7 @@ class ConfigManager:
             config = config[k]
         
         config[keys[-1]] = value
+        self._flat = None
     
     def save_config(self) -> None:
         """保存配置到文件"""
@@ -3,13 +3,127 @@
 """
 
 import asyncio
+import functools
+import hashlib
+import itertools
 import logging
 import re
 import time
-from typing import Optional, List, Dict, Any, Callable
-from dataclasses import dataclass
+import zlib
+import numpy as np
+from collections import deque
+from types import MappingProxyType
+from typing import Optional, List, Dict, Any, Callable, Deque, Iterator, Mapping, Tuple
+from dataclasses import dataclass, field
 from enum import Enum
 
+from ..modules.tts.parallel_tts import ParallelTTS
+
+
+# 系统提示 - Hiyori 角色设定（跨轮次保持不变）
+SYSTEM_PROMPT = """你是 Hiyori，一个活泼可爱的虚拟数字人。你具有以下特点：
+
+1. 性格：开朗、友善、充满活力，偶尔会有点调皮
+2. 说话风格：亲切自然，喜欢使用表情符号表达情感
+3. 情感表达：通过 [EMOTION:emoji] 标签来表达情感，比如：
+   - 开心时使用 [EMOTION:😊]
+   - 思考时使用 [EMOTION:🤔]
+   - 兴奋时使用 [EMOTION:🤩]
+   - 难过时使用 [EMOTION:😢]
+
+请根据对话内容适当使用情感标签，让交流更加生动有趣。"""
+
+SYSTEM_MESSAGE = {"role": "system", "content": SYSTEM_PROMPT}
+
+# 构建上下文时保留的最近对话轮数
+CONTEXT_HISTORY_TURNS = 5
+
+
+# 麦克风音频按固定窗口合并后再做 VAD（16kHz、16 位单声道，每窗口 320ms）
+AUDIO_SAMPLE_RATE = 16000
+AUDIO_SAMPLE_WIDTH = 2
+AUDIO_WINDOW_SECONDS = 0.32
+AUDIO_WINDOW_SAMPLES = int(AUDIO_SAMPLE_RATE * AUDIO_WINDOW_SECONDS)
+AUDIO_WINDOW_BYTES = AUDIO_WINDOW_SAMPLES * AUDIO_SAMPLE_WIDTH
+
+# 待处理音频块队列上限，队列满时生产者等待
+AUDIO_QUEUE_MAXSIZE = 16
+
+# 回复中的情感标签，例如 [EMOTION:😊]
+EMOTION_TAG_RE = re.compile(r'\[EMOTION:([^\]]+)\]')
+
+# 情感标签解析结果的缓存条目数（短回复和固定回复经常重复）
+EMOTION_PARSE_CACHE_SIZE = 256
+
+# 流式回复的切分扫描：一次遍历同时匹配情感标签、句子结束符（英文句点需后跟空白，
+# 避免切开小数和缩写）和分句符。情感标签整体匹配，标签内的标点不会被当作边界。
+# 缓冲区超过 CLAUSE_SPLIT_CHARS 仍未遇到句子结束符时在最后一个分句符处切分，
+# 超过 MAX_CHUNK_CHARS 时强制切分，避免长句拖慢首段语音
+STREAM_SPLIT_RE = re.compile(
+    r'(?P<emo>\[EMOTION:[^\]]+\])|(?P<eos>[。！？!?；;\n]|\.(?=\s))|(?P<clause>[，,、：:])'
+)
+CLAUSE_SPLIT_CHARS = 40
+MAX_CHUNK_CHARS = 120
+
+# 动态上下文去重：按内容定义的边界切分文本块，行哈希对该值取模为 0 时在此行后切分
+CONTEXT_CHUNK_MODULUS = 4
+
+# 短于该长度的文本块不替换为引用（引用标记本身也占用 token）
+CONTEXT_BLOCK_MIN_CHARS = 64
+
+# 引用标记中引用原文开头的字符数，模型据此在上文中找到对应内容
+CONTEXT_QUOTE_CHARS = 16
+
+# 同时合成的句子数上限
+TTS_CONCURRENCY = 3
+
+# 情感动画与播放并发执行，播放结束后最多再等待的秒数
+EMOTION_ANIMATION_TIMEOUT = 1.0
+
+
+# 情感标签 -> (表情, 动作组)，进程内不变的只读表
+EMOTION_MAPPING: Mapping[str, Tuple[str, str]] = MappingProxyType({
+    "😊": ("happy", "Happy"),
+    "🤩": ("excited_star", "Excited"),
+    "😎": ("cool", "Confident"),
+    "😏": ("smug", "Confident"),
+    "💪": ("determined", "Confident"),
+    "😳": ("embarrassed", "Nervous"),
+    "😲": ("shocked", "Surprised"),
+    "🤔": ("thinking", "Thinking"),
+    "👀": ("suspicious", "Thinking"),
+    "😤": ("frustrated", "Angry"),
+    "😢": ("sad", "Sad"),
+    "😅": ("awkward", "Nervous"),
+    "🙄": ("dismissive", "Annoyed"),
+    "💕": ("adoring", "Happy"),
+    "😂": ("laughing", "Happy"),
+    "🔥": ("passionate", "Excited"),
+    "✨": ("sparkle", "Happy"),
+})
+
+
+def _is_blank(text: Optional[str]) -> bool:
+    """文本为空或只含空白字符（不创建去除空白后的新字符串）"""
+    return not text or text.isspace()
+
+
+@functools.lru_cache(maxsize=EMOTION_PARSE_CACHE_SIZE)
+def _parse_emotion_tags_cached(text: str) -> Tuple[Optional[str], str]:
+    """一次扫描同时取出情感标签并清理文本，相同的回复直接返回缓存结果"""
+    matches = []
+    
+    def take_tag(match):
+        matches.append(match.group(1))
+        return ''
+    
+    clean_text = EMOTION_TAG_RE.sub(take_tag, text).strip()
+    
+    # 返回最后一个情感标签（如果有多个）
+    emotion = matches[-1] if matches else None
+    
+    return emotion, clean_text
+
 
 class ConversationState(Enum):
     """对话状态"""
@@ -31,7 +145,12 @@ class ConversationTurn:
     llm_latency: float = 0.0
     tts_latency: float = 0.0
     total_latency: float = 0.0
+    first_audio_latency: float = 0.0
     emotion_detected: Optional[str] = None
+    # 轮次开始时的单调时钟读数，各项延迟都以单调时钟计算，timestamp 仅作为墙上时间记录
+    perf_start: float = field(default_factory=time.monotonic, repr=False)
+    # 本轮第一句开始合成时的单调时钟读数，0 表示尚未开始
+    tts_start: float = field(default=0.0, repr=False)
 
 
 class ConversationManager:
@@ -54,10 +173,26 @@ class ConversationManager:
         
         self.logger = logging.getLogger(__name__)
         self.state = ConversationState.IDLE
+        self._state_changed = asyncio.Event()
         
-        # 对话历史
-        self.conversation_history: List[ConversationTurn] = []
+        # 对话历史，超出上限时 deque 自动丢弃最早的轮次
         self.max_history_turns = 10
+        self.conversation_history: Deque[ConversationTurn] = deque(maxlen=self.max_history_turns)
+        
+        # 动态上下文（检索到的记忆等），每轮可变，与静态角色设定分开发送
+        self.memory_block = ""
+        
+        # 最近几轮历史对应的消息列表，在历史变化时由后台任务重建，构建上下文时直接复用
+        self._ctx_history: List[Dict[str, str]] = []
+        # 上述历史消息中长文本块的内容哈希，动态上下文中重复的块替换为引用
+        self._ctx_blocks: frozenset = frozenset()
+        
+        # 音频输入：有界队列提供背压，音频块以 int16 视图拷入预分配的窗口缓冲区，
+        # 未用完的块尾部以视图形式保存在 _audio_rest
+        self._audio_queue: asyncio.Queue = asyncio.Queue(maxsize=AUDIO_QUEUE_MAXSIZE)
+        self._audio_window = np.empty(AUDIO_WINDOW_SAMPLES, dtype=np.int16)
+        self._vad_samples = np.empty(AUDIO_WINDOW_SAMPLES, dtype=np.float32)
+        self._audio_rest: Optional[np.ndarray] = None
         
         # 实时状态
         self._current_turn: Optional[ConversationTurn] = None
@@ -65,33 +200,35 @@ class ConversationManager:
         self._processing_task: Optional[asyncio.Task] = None
         self._speaking_task: Optional[asyncio.Task] = None
         
+        # 后台写入：轮次完成后的历史记录和回调在后台按顺序执行，不阻塞回复
+        self._bg_queue: asyncio.Queue = asyncio.Queue()
+        self._bg_task: Optional[asyncio.Task] = None
+        
+        # 回复的各句并发合成，按句子顺序播放
+        self._parallel_tts = ParallelTTS(TTS_CONCURRENCY)
+        
         # 配置
         self.voice_threshold = 0.5
         self.silence_timeout = 2.0  # 静音超时秒数
         self.max_speech_duration = 30.0  # 最大语音时长
         
-        # 情感映射
-        self.emotion_mapping = {
-            "😊": {"expression": "happy", "motion_group": "Happy"},
-            "🤩": {"expression": "excited_star", "motion_group": "Excited"},
-            "😎": {"expression": "cool", "motion_group": "Confident"},
-            "😏": {"expression": "smug", "motion_group": "Confident"},
-            "💪": {"expression": "determined", "motion_group": "Confident"},
-            "😳": {"expression": "embarrassed", "motion_group": "Nervous"},
-            "😲": {"expression": "shocked", "motion_group": "Surprised"},
-            "🤔": {"expression": "thinking", "motion_group": "Thinking"},
-            "👀": {"expression": "suspicious", "motion_group": "Thinking"},
-            "😤": {"expression": "frustrated", "motion_group": "Angry"},
-            "😢": {"expression": "sad", "motion_group": "Sad"},
-            "😅": {"expression": "awkward", "motion_group": "Nervous"},
-            "🙄": {"expression": "dismissive", "motion_group": "Annoyed"},
-            "💕": {"expression": "adoring", "motion_group": "Happy"},
-            "😂": {"expression": "laughing", "motion_group": "Happy"},
-            "🔥": {"expression": "passionate", "motion_group": "Excited"},
-            "✨": {"expression": "sparkle", "motion_group": "Happy"},
-        }
-        
-        # 事件回调
+        # 一段语音的采样缓冲区，按最大语音时长预分配（多留一个窗口的余量），
+        # 语音窗口直接拷入其中，识别时传入切片视图
+        self._utterance = np.empty(
+            int(AUDIO_SAMPLE_RATE * self.max_speech_duration) + AUDIO_WINDOW_SAMPLES, dtype=np.int16
+        )
+        
+        # Live2D 管理器在对话管理器的生命周期内不变，构造时选定合成和播放实现，
+        # 每句回复不再判断是否需要动画
+        if live2d_manager:
+            self._synthesize_sentence = self._synthesize_sentence_with_phonemes
+            self._play_sentence = self._play_sentence_with_live2d
+        else:
+            self._synthesize_sentence = self._synthesize_sentence_audio_only
+            self._play_sentence = self._play_sentence_audio_only
+        
+        # 事件回调，通过 _fire 异步调用；协程回调的任务在此保留引用直到完成
+        self._callback_tasks: set = set()
         self.on_state_changed: Optional[Callable[[ConversationState], None]] = None
         self.on_user_speech: Optional[Callable[[str], None]] = None
         self.on_assistant_response: Optional[Callable[[str], None]] = None
@@ -102,6 +239,7 @@ class ConversationManager:
         """启动对话循环"""
         self.logger.info("启动对话管理器")
         self._set_state(ConversationState.IDLE)
+        self._bg_task = asyncio.create_task(self._bg_worker())
         
         while True:
             try:
@@ -109,25 +247,23 @@ class ConversationManager:
                     # 开始监听
                     self._set_state(ConversationState.LISTENING)
                     self._listening_task = asyncio.create_task(self._listen_for_speech())
-                    await self._listening_task
+                    await self._await_turn_task(self._listening_task)
                 
-                elif self.state == ConversationState.PROCESSING:
+                elif self.state == ConversationState.PROCESSING and self._current_turn:
                     # 处理语音输入
-                    if self._current_turn:
-                        self._processing_task = asyncio.create_task(
-                            self._process_conversation_turn(self._current_turn)
-                        )
-                        await self._processing_task
-                
-                elif self.state == ConversationState.SPEAKING:
-                    # 等待语音播放完成
-                    await asyncio.sleep(0.1)
+                    self._processing_task = asyncio.create_task(
+                        self._process_conversation_turn(self._current_turn)
+                    )
+                    await self._await_turn_task(self._processing_task)
                 
                 else:
-                    await asyncio.sleep(0.1)
+                    # 其他状态下等待状态变更，不轮询
+                    self._state_changed.clear()
+                    await self._state_changed.wait()
                     
             except asyncio.CancelledError:
                 self.logger.info("对话循环被取消")
+                await self._stop_bg_worker()
                 break
             except Exception as e:
                 self.logger.error(f"对话循环出错: {e}")
@@ -135,6 +271,23 @@ class ConversationManager:
                 await asyncio.sleep(1.0)  # 错误恢复等待
                 self._set_state(ConversationState.IDLE)
     
+    @staticmethod
+    async def _await_turn_task(task: asyncio.Task):
+        """
+        等待轮次子任务结束
+        
+        子任务被 interrupt_current_turn 取消时正常返回，继续对话循环；
+        对话循环本身被取消时一并取消子任务。子任务的其他异常照常抛出
+        """
+        try:
+            await asyncio.wait((task,))
+        except asyncio.CancelledError:
+            task.cancel()
+            raise
+        
+        if not task.cancelled() and task.exception():
+            raise task.exception()
+    
     async def _listen_for_speech(self):
         """监听语音输入"""
         self.logger.debug("开始监听语音...")
@@ -144,72 +297,133 @@ class ConversationManager:
             await self.live2d_manager.set_idle_animation()
         
         speech_detected = False
-        speech_buffer = []
+        speech_samples = 0
         silence_start = None
         speech_start = None
         
+        # 静音开始时提前识别已收集的语音：(识别的采样数, 识别任务)。
+        # 静音一直持续到超时则语音没有变化，直接使用提前得到的结果
+        speculative: Optional[Tuple[int, asyncio.Task]] = None
+        
+        # 丢弃进入监听状态之前积压的音频
+        self._drain_audio_queue()
+        
         try:
             while self.state == ConversationState.LISTENING:
-                # 这里应该从音频管理器获取实时音频块
-                # 暂时使用模拟的等待
-                await asyncio.sleep(0.1)
-                
-                # TODO: 实际的音频处理逻辑
-                # audio_chunk = await self.audio_manager.get_audio_chunk()
-                # has_speech = await self.asr.detect_voice_activity(audio_chunk)
-                
-                # 模拟语音活动检测
-                has_speech = False  # 这里需要实际的 VAD 检测
+                # 等待凑满一个音频窗口后再做 VAD
+                audio_chunk = await self._next_audio_window()
+                has_speech = await self._detect_speech(audio_chunk)
                 
                 if has_speech:
                     if not speech_detected:
                         # 开始说话
                         speech_detected = True
-                        speech_start = time.time()
+                        speech_start = time.monotonic()
                         self.logger.debug("检测到语音活动")
                     
                     silence_start = None
-                    # speech_buffer.append(audio_chunk)
+                    # 窗口缓冲区会被下一个窗口覆盖，只有语音窗口才拷入语音缓冲区
+                    self._utterance[speech_samples:speech_samples + AUDIO_WINDOW_SAMPLES] = audio_chunk
+                    speech_samples += AUDIO_WINDOW_SAMPLES
                     
-                    # 检查最大语音时长
-                    if speech_start and (time.time() - speech_start) > self.max_speech_duration:
+                    # 检查最大语音时长（缓冲区已满时同样结束）
+                    if (speech_start and (time.monotonic() - speech_start) > self.max_speech_duration) \
+                            or speech_samples + AUDIO_WINDOW_SAMPLES > len(self._utterance):
                         self.logger.warning("语音输入超时，强制结束")
                         break
                 
                 elif speech_detected:
                     # 说话中的静音
                     if silence_start is None:
-                        silence_start = time.time()
-                    elif (time.time() - silence_start) > self.silence_timeout:
+                        silence_start = time.monotonic()
+                        
+                        # 上一次提前识别仍在运行时不再启动，避免同时占用模型
+                        if speculative is None or speculative[1].done():
+                            speculative = (speech_samples, asyncio.create_task(
+                                self.asr.transcribe(self._utterance[:speech_samples], skip_silent=False)
+                            ))
+                    elif (time.monotonic() - silence_start) > self.silence_timeout:
                         # 静音超时，结束语音输入
                         self.logger.debug("检测到语音结束")
                         break
             
             # 处理收集到的语音数据
-            if speech_detected and speech_buffer:
-                await self._handle_speech_input(speech_buffer)
+            if speech_detected and speech_samples:
+                await self._handle_speech_input(self._utterance[:speech_samples], speculative, speech_samples)
             
         except asyncio.CancelledError:
+            if speculative:
+                speculative[1].cancel()
             self.logger.debug("语音监听被取消")
         except Exception as e:
             self.logger.error(f"语音监听出错: {e}")
             self._set_state(ConversationState.ERROR)
     
-    async def _handle_speech_input(self, speech_buffer):
-        """处理语音输入"""
+    async def _next_audio_window(self) -> np.ndarray:
+        """从音频队列中凑满一个音频窗口，返回的缓冲区在下次调用时被覆盖"""
+        window = self._audio_window
+        filled = 0
+        
+        while filled < AUDIO_WINDOW_SAMPLES:
+            rest = self._audio_rest
+            if rest is None:
+                rest = np.frombuffer(await self._audio_queue.get(), dtype=np.int16)
+            
+            take = min(len(rest), AUDIO_WINDOW_SAMPLES - filled)
+            window[filled:filled + take] = rest[:take]
+            filled += take
+            self._audio_rest = rest[take:] if take < len(rest) else None
+        
+        return window
+    
+    def _drain_audio_queue(self):
+        """清空音频队列和未满窗口的数据"""
+        self._audio_rest = None
+        while not self._audio_queue.empty():
+            self._audio_queue.get_nowait()
+    
+    async def _detect_speech(self, audio_chunk: np.ndarray) -> bool:
+        """对一个音频窗口做语音活动检测"""
+        if not self.asr:
+            return False
+        
+        # 归一化结果写入预分配的 float32 缓冲区
+        samples = np.multiply(audio_chunk, 1.0 / 32768.0, out=self._vad_samples)
+        vad_result = await self.asr.detect_voice_activity(samples)
+        return vad_result.is_speech
+    
+    async def _handle_speech_input(self, speech_audio: np.ndarray,
+                                   speculative: Optional[Tuple[int, asyncio.Task]] = None,
+                                   speech_samples: int = 0):
+        """
+        处理语音输入
+        
+        Args:
+            speech_audio: 语音缓冲区的视图，仅在本次调用期间有效
+            speculative: 静音开始时启动的提前识别 (识别的采样数, 识别任务)
+            speech_samples: 语音的采样数，与提前识别的采样数相同时直接使用其结果
+        """
         try:
-            # 合并音频块
-            combined_audio = b''.join(speech_buffer)
-            
             # 启动新的对话轮次
             turn_start = time.time()
-            
-            # 语音识别
-            asr_start = time.time()
-            recognized_text = await self.asr.transcribe(combined_audio)
-            asr_time = time.time() - asr_start
-            
-            if not recognized_text or recognized_text.strip() == "":
+            perf_start = time.monotonic()
+            
+            # 语音识别，延迟从语音结束算起
+            asr_start = time.monotonic()
+            result = None
+            if speculative:
+                samples, task = speculative
+                if samples == speech_samples:
+                    result = await task
+                else:
+                    # 提前识别的语音已过时，等它结束后再识别完整语音，不同时占用模型
+                    await asyncio.gather(task, return_exceptions=True)
+            if result is None:
+                result = await self.asr.transcribe(speech_audio, skip_silent=False)
+            recognized_text = result.text
+            asr_time = time.monotonic() - asr_start
+            
+            if _is_blank(recognized_text):
                 self.logger.debug("未识别到有效文本")
                 self._set_state(ConversationState.IDLE)
                 return
@@ -221,12 +435,12 @@ class ConversationManager:
                 user_input=recognized_text,
                 assistant_response="",
                 timestamp=turn_start,
-                asr_latency=asr_time
+                asr_latency=asr_time,
+                perf_start=perf_start
             )
             
             # 触发回调
-            if self.on_user_speech:
-                self.on_user_speech(recognized_text)
+            self._fire(self.on_user_speech, recognized_text)
             
             # 切换到处理状态
             self._set_state(ConversationState.PROCESSING)
@@ -236,61 +450,72 @@ class ConversationManager:
             self._set_state(ConversationState.ERROR)
     
     async def _process_conversation_turn(self, turn: ConversationTurn):
-        """处理完整的对话轮次"""
+        """处理完整的对话轮次，LLM 每生成完一句就提交合成，合成完成后按顺序播放，不等待完整回复"""
         try:
             self.logger.info(f"处理用户输入: {turn.user_input}")
+            self._set_state(ConversationState.RESPONDING)
+            
+            # LLM 流式生成在后台任务中进行，播放当前句子时继续接收后续句子
+            sentences: asyncio.Queue = asyncio.Queue()
+            llm_start = time.monotonic()
+            producer = asyncio.create_task(self._stream_llm_sentences(turn.user_input, sentences))
             
-            # LLM 生成回应
-            llm_start = time.time()
-            response_text = await self._generate_llm_response(turn.user_input)
-            turn.llm_latency = time.time() - llm_start
+            # 播放任务按顺序取出合成结果，播放第 N 句时后续句子继续合成
+            parallel_tts = self._parallel_tts
+            parallel_tts.reset()
+            player = asyncio.create_task(self._play_sentences(turn))
             
-            if not response_text:
+            raw_parts = []
+            emotion = None
+            index = 0
+            try:
+                while True:
+                    sentence = await sentences.get()
+                    if sentence is None:
+                        break
+                    
+                    # 首句到达的延迟即用户感知到的 LLM 延迟
+                    if not raw_parts:
+                        turn.llm_latency = time.monotonic() - llm_start
+                    raw_parts.append(sentence)
+                    
+                    # 解析情感标签，情感变化时更新动画
+                    sentence_emotion, clean_text = self._parse_emotion_tags(sentence)
+                    new_emotion = None
+                    if sentence_emotion and sentence_emotion != emotion:
+                        emotion = new_emotion = sentence_emotion
+                        self.logger.info(f"检测到情感: {emotion}")
+                        self._fire(self.on_emotion_detected, emotion)
+                    
+                    if clean_text:
+                        parallel_tts.submit(index, self._synthesize_sentence(turn, clean_text, new_emotion))
+                        index += 1
+                
+                parallel_tts.close()
+                await player
+            finally:
+                producer.cancel()
+                player.cancel()
+                parallel_tts.cancel()
+            
+            if not raw_parts:
                 self.logger.warning("LLM 未生成有效回应")
                 self._set_state(ConversationState.IDLE)
                 return
             
-            # 解析情感标签
-            emotion, clean_text = self._parse_emotion_tags(response_text)
+            # 完整回复用于历史记录和回调
+            emotion, clean_text = self._parse_emotion_tags("".join(raw_parts))
             turn.assistant_response = clean_text
             turn.emotion_detected = emotion
             
             self.logger.info(f"生成回应: {clean_text}")
-            if emotion:
-                self.logger.info(f"检测到情感: {emotion}")
-            
-            # 触发回调
-            if self.on_assistant_response:
-                self.on_assistant_response(clean_text)
-            if emotion and self.on_emotion_detected:
-                self.on_emotion_detected(emotion)
-            
-            # 设置情感动画
-            if emotion and self.live2d_manager:
-                await self._set_emotion_animation(emotion)
-            
-            # 语音合成
-            self._set_state(ConversationState.RESPONDING)
-            tts_start = time.time()
-            audio_data = await self.tts.synthesize(clean_text)
-            turn.tts_latency = time.time() - tts_start
-            
-            if audio_data:
-                # 播放语音并同步动画
-                self._set_state(ConversationState.SPEAKING)
-                await self._play_speech_with_animation(audio_data, clean_text)
+            self._fire(self.on_assistant_response, clean_text)
             
             # 计算总延迟
-            turn.total_latency = time.time() - turn.timestamp
-            
-            # 添加到历史记录
-            self.conversation_history.append(turn)
-            if len(self.conversation_history) > self.max_history_turns:
-                self.conversation_history = self.conversation_history[-self.max_history_turns:]
+            turn.total_latency = time.monotonic() - turn.perf_start
             
-            # 触发回调
-            if self.on_turn_completed:
-                self.on_turn_completed(turn)
+            # 历史记录和回调交给后台任务
+            self._submit_turn(turn, notify=True)
             
             self.logger.info(f"对话轮次完成，总延迟: {turn.total_latency:.2f}s")
             
@@ -302,10 +527,178 @@ class ConversationManager:
             self.logger.error(f"处理对话轮次失败: {e}")
             self._set_state(ConversationState.ERROR)
     
+    async def _synthesize_sentence_with_phonemes(self, turn: ConversationTurn, text: str,
+                                                 emotion: Optional[str]):
+        """合成一句回复，同时计算唇形同步用的音素时序"""
+        self._begin_tts(turn)
+        tts_audio, phoneme_timing = await asyncio.gather(
+            self.tts.synthesize(text), self.tts.get_phoneme_timing(text)
+        )
+        self._end_tts(turn)
+        return tts_audio, phoneme_timing, emotion
+    
+    async def _synthesize_sentence_audio_only(self, turn: ConversationTurn, text: str,
+                                              emotion: Optional[str]):
+        """没有 Live2D 模型时只合成语音"""
+        self._begin_tts(turn)
+        tts_audio = await self.tts.synthesize(text)
+        self._end_tts(turn)
+        return tts_audio, None, emotion
+    
+    @staticmethod
+    def _begin_tts(turn: ConversationTurn):
+        """记录本轮第一句开始合成的时间"""
+        if not turn.tts_start:
+            turn.tts_start = time.monotonic()
+    
+    @staticmethod
+    def _end_tts(turn: ConversationTurn):
+        """
+        TTS 延迟取第一句开始合成到最后一句合成结束的时间；
+        各句并发合成，逐句累加会把重叠的时间重复计算
+        """
+        turn.tts_latency = time.monotonic() - turn.tts_start
+    
+    async def _play_sentences(self, turn: ConversationTurn):
+        """按提交顺序播放合成好的句子，直到本轮所有句子播放完毕"""
+        while True:
+            try:
+                result = await self._parallel_tts.next()
+            except Exception as e:
+                self.logger.error(f"语音合成失败: {e}")
+                continue
+            
+            if result is None:
+                return
+            
+            tts_audio, phoneme_timing, emotion = result
+            if tts_audio:
+                self._mark_first_audio(turn)
+                self._set_state(ConversationState.SPEAKING)
+                await self._play_sentence(tts_audio, phoneme_timing, emotion)
+    
+    async def _play_sentence_with_live2d(self, tts_audio, phoneme_timing, emotion: Optional[str]):
+        """播放一句回复，emotion 不为空时同时切换情感动画"""
+        animation_task = asyncio.create_task(self._set_emotion_animation(emotion)) if emotion else None
+        try:
+            await self._play_speech_with_animation(tts_audio, phoneme_timing)
+        finally:
+            if animation_task:
+                await self._finish_emotion_animation(animation_task)
+    
+    async def _play_sentence_audio_only(self, tts_audio, phoneme_timing, emotion: Optional[str]):
+        """没有 Live2D 模型时只播放语音"""
+        try:
+            await self.tts.play_audio(tts_audio.audio_data)
+        except Exception as e:
+            self.logger.error(f"播放语音失败: {e}")
+    
+    @staticmethod
+    def _mark_first_audio(turn: ConversationTurn):
+        """记录本轮第一段语音开始播放的延迟"""
+        if not turn.first_audio_latency:
+            turn.first_audio_latency = time.monotonic() - turn.perf_start
+    
+    @staticmethod
+    def _find_chunk_end(buffer: str) -> int:
+        """返回缓冲区中可以送去合成的前缀长度，0 表示继续等待后续文本"""
+        # 末尾未闭合的情感标签（如流式到一半的 "[EMOTION:"）不参与扫描，
+        # 切分点都落在它之前，标签内的标点不会被当作边界
+        limit = len(buffer)
+        tag_start = buffer.rfind("[")
+        if tag_start >= 0 and "]" not in buffer[tag_start:] and limit - tag_start < MAX_CHUNK_CHARS:
+            limit = tag_start
+        
+        sentence_end = clause_end = 0
+        for match in STREAM_SPLIT_RE.finditer(buffer, 0, limit):
+            kind = match.lastgroup
+            if kind == "eos":
+                sentence_end = match.end()
+            elif kind == "clause":
+                clause_end = match.end()
+        
+        # 在最后一个句子结束符之后切分，剩余部分留待后续文本补全
+        if sentence_end or len(buffer) < CLAUSE_SPLIT_CHARS:
+            return sentence_end
+        
+        # 长句在最后一个分句符之后切分
+        if clause_end or len(buffer) < MAX_CHUNK_CHARS:
+            return clause_end
+        
+        # 强制切分，不切开未闭合的情感标签
+        cut = min(MAX_CHUNK_CHARS, limit)
+        tag_start = buffer.rfind("[", 0, cut)
+        if tag_start > 0 and "]" not in buffer[tag_start:cut]:
+            cut = tag_start
+        return cut
+    
+    async def _stream_llm_sentences(self, user_input: str, sentences: asyncio.Queue):
+        """流式接收 LLM 回复，按句子边界切分后放入队列，结束时放入 None"""
+        try:
+            await self._bg_queue.join()
+            messages = self._build_conversation_context(user_input)
+            
+            buffer = ""
+            async for delta in self.llm.stream_chat_completion(messages):
+                buffer += delta
+                
+                cut = self._find_chunk_end(buffer)
+                if cut:
+                    sentences.put_nowait(buffer[:cut])
+                    buffer = buffer[cut:]
+            
+            if buffer.strip():
+                sentences.put_nowait(buffer)
+                
+        except Exception as e:
+            self.logger.error(f"LLM 生成回应失败: {e}")
+        finally:
+            sentences.put_nowait(None)
+    
+    def _submit_turn(self, turn: ConversationTurn, notify: bool):
+        """记录完成的轮次，后台任务运行时排队执行，否则立即执行"""
+        if self._bg_task and not self._bg_task.done():
+            self._bg_queue.put_nowait((turn, notify))
+        else:
+            self._record_turn(turn, notify)
+    
+    def _record_turn(self, turn: ConversationTurn, notify: bool):
+        """写入历史记录并触发轮次完成回调"""
+        self.conversation_history.append(turn)
+        self._ctx_history, self._ctx_blocks = self._build_history_messages()
+        
+        if notify:
+            self._fire(self.on_turn_completed, turn)
+    
+    async def _bg_worker(self):
+        """后台任务：按提交顺序处理完成的轮次"""
+        while True:
+            turn, notify = await self._bg_queue.get()
+            try:
+                self._record_turn(turn, notify)
+            except Exception as e:
+                self.logger.error(f"记录对话轮次失败: {e}")
+            finally:
+                self._bg_queue.task_done()
+    
+    async def _stop_bg_worker(self):
+        """处理完排队的轮次后停止后台任务"""
+        if not self._bg_task:
+            return
+        
+        await self._bg_queue.join()
+        self._bg_task.cancel()
+        try:
+            await self._bg_task
+        except asyncio.CancelledError:
+            pass
+        self._bg_task = None
+    
     async def _generate_llm_response(self, user_input: str) -> str:
         """生成 LLM 回应"""
         try:
-            # 构建对话上下文
+            # 构建对话上下文（先等待上一轮的历史写入完成）
+            await self._bg_queue.join()
             messages = self._build_conversation_context(user_input)
             
             # 调用 LLM
@@ -318,60 +711,104 @@ class ConversationManager:
     
     def _build_conversation_context(self, user_input: str) -> List[Dict[str, str]]:
         """构建对话上下文"""
-        messages = []
-        
-        # 系统提示 - Hiyori 角色设定
-        system_prompt = """你是 Hiyori，一个活泼可爱的虚拟数字人。你具有以下特点：
-
-1. 性格：开朗、友善、充满活力，偶尔会有点调皮
-2. 说话风格：亲切自然，喜欢使用表情符号表达情感
-3. 情感表达：通过 [EMOTION:emoji] 标签来表达情感，比如：
-   - 开心时使用 [EMOTION:😊]
-   - 思考时使用 [EMOTION:🤔]
-   - 兴奋时使用 [EMOTION:🤩]
-   - 难过时使用 [EMOTION:😢]
-
-请根据对话内容适当使用情感标签，让交流更加生动有趣。"""
-        
-        messages.append({"role": "system", "content": system_prompt})
+        # 静态角色设定始终作为第一条消息且内容不变，保证服务端提示缓存命中；
+        # 历史消息已在记录轮次时构建好
+        messages = [SYSTEM_MESSAGE, *self._ctx_history]
         
-        # 添加历史对话
-        for turn in self.conversation_history[-5:]:  # 只保留最近5轮对话
-            messages.append({"role": "user", "content": turn.user_input})
-            messages.append({"role": "assistant", "content": turn.assistant_response})
+        # 动态上下文（记忆等）作为单独的消息放在末尾，不拼接进角色设定
+        if self.memory_block:
+            messages.append({"role": "system", "content": self._dedupe_context(self.memory_block)})
         
         # 添加当前用户输入
         messages.append({"role": "user", "content": user_input})
         
         return messages
     
-    def _parse_emotion_tags(self, text: str) -> tuple[Optional[str], str]:
-        """解析情感标签"""
-        # 查找情感标签
-        emotion_pattern = r'\[EMOTION:([^\]]+)\]'
-        matches = re.findall(emotion_pattern, text)
+    def _build_history_messages(self) -> Tuple[List[Dict[str, str]], frozenset]:
+        """
+        将最近几轮对话转换为消息列表，同时收集其中长文本块的内容哈希
+        
+        历史消息原样发送：助手回复会被模型模仿、也会被朗读，不能带引用标记；
+        原样发送也保证历史只在末尾追加，服务端前缀缓存持续命中
+        """
+        messages = []
+        blocks = set()
+        history = self.conversation_history
+        for turn in itertools.islice(history, max(len(history) - CONTEXT_HISTORY_TURNS, 0), None):
+            for role, text in (("user", turn.user_input), ("assistant", turn.assistant_response)):
+                messages.append({"role": role, "content": text})
+                blocks.update(
+                    digest for digest in map(self._block_digest, self._split_context_blocks(text)) if digest
+                )
+        return messages, frozenset(blocks)
+    
+    @staticmethod
+    def _block_digest(block: str) -> Optional[str]:
+        """长文本块的内容哈希，短块不参与去重时返回 None"""
+        if len(block) < CONTEXT_BLOCK_MIN_CHARS:
+            return None
+        return hashlib.sha256(block.encode("utf-8")).hexdigest()
+    
+    def _dedupe_context(self, text: str) -> str:
+        """
+        对动态上下文（记忆等系统消息）做块级去重
+        
+        只处理不会被朗读、也不会出现在助手回复里的系统上下文。已出现在历史消息中
+        或在本段前文出现过的块替换为 [SEEN: "开头原文…"] 标记，模型可据此找到原文。
+        
+        Args:
+            text: 动态上下文文本
+            
+        Returns:
+            去重后的文本
+        """
+        seen = set(self._ctx_blocks)
+        parts = []
+        for block in self._split_context_blocks(text):
+            digest = self._block_digest(block)
+            if digest is None:
+                parts.append(block)
+            elif digest in seen:
+                tag = f'[SEEN: "{block[:CONTEXT_QUOTE_CHARS].strip()}…"]'
+                parts.append(tag + "\n" if block.endswith("\n") else tag)
+            else:
+                seen.add(digest)
+                parts.append(block)
         
-        # 清理文本
-        clean_text = re.sub(emotion_pattern, '', text).strip()
+        return "".join(parts)
+    
+    @staticmethod
+    def _split_context_blocks(text: str) -> List[str]:
+        """按行哈希切分文本块，相同内容在不同位置出现时切出相同的块"""
+        blocks = []
+        current = []
+        for line in text.splitlines(keepends=True):
+            current.append(line)
+            if zlib.crc32(line.encode("utf-8")) % CONTEXT_CHUNK_MODULUS == 0:
+                blocks.append("".join(current))
+                current = []
         
-        # 返回最后一个情感标签（如果有多个）
-        emotion = matches[-1] if matches else None
+        if current:
+            blocks.append("".join(current))
         
-        return emotion, clean_text
+        return blocks
+    
+    def _parse_emotion_tags(self, text: str) -> tuple[Optional[str], str]:
+        """解析情感标签，返回最后一个情感标签和清理后的文本"""
+        return _parse_emotion_tags_cached(text)
     
     async def _set_emotion_animation(self, emotion: str):
         """设置情感动画"""
         try:
-            if emotion in self.emotion_mapping:
-                mapping = self.emotion_mapping[emotion]
+            entry = EMOTION_MAPPING.get(emotion)
+            if entry:
+                expression, motion_group = entry
                 
                 # 设置表情
-                if mapping.get("expression"):
-                    await self.live2d_manager.set_expression(mapping["expression"])
+                await self.live2d_manager.set_expression(expression)
                 
                 # 播放动作
-                if mapping.get("motion_group"):
-                    await self.live2d_manager.play_motion(mapping["motion_group"])
+                await self.live2d_manager.play_motion(motion_group)
                     
                 self.logger.debug(f"应用情感动画: {emotion}")
             else:
@@ -380,21 +817,25 @@ class ConversationManager:
         except Exception as e:
             self.logger.error(f"设置情感动画失败: {e}")
     
-    async def _play_speech_with_animation(self, audio_data: bytes, text: str):
-        """播放语音并同步动画"""
+    async def _finish_emotion_animation(self, task: asyncio.Task):
+        """等待并发执行的情感动画完成，超时则取消"""
+        try:
+            await asyncio.wait_for(task, EMOTION_ANIMATION_TIMEOUT)
+        except asyncio.TimeoutError:
+            self.logger.warning("情感动画超时")
+    
+    async def _play_speech_with_animation(self, tts_audio, phoneme_timing=None):
+        """播放合成的语音段并同步动画，phoneme_timing 为与合成并发计算的音素时序"""
         try:
-            # 获取音素时序信息用于唇形同步
-            phoneme_timing = await self.tts.get_phoneme_timing(text)
-            
             # 启动唇形同步任务
             lipsync_task = None
             if self.live2d_manager and phoneme_timing:
                 lipsync_task = asyncio.create_task(
-                    self.live2d_manager.sync_lipsync(phoneme_timing)
+                    self.live2d_manager.sync_lipsync(phoneme_timing, tts_audio.duration)
                 )
             
             # 播放音频
-            await self.tts.play_audio(audio_data)
+            await self.tts.play_audio(tts_audio.audio_data)
             
             # 等待唇形同步完成
             if lipsync_task:
@@ -404,11 +845,9 @@ class ConversationManager:
             self.logger.error(f"播放语音和动画失败: {e}")
     
     async def process_audio(self, audio_data: bytes):
-        """处理音频数据（从外部调用）"""
+        """处理音频数据（从外部调用），队列满时等待监听协程消费"""
         if self.state == ConversationState.LISTENING:
-            # 这里可以累积音频数据进行 VAD 检测
-            # 如果检测到语音，则切换状态
-            pass
+            await self._audio_queue.put(audio_data)
     
     async def process_text_input(self, text: str) -> str:
         """处理文本输入（用于调试或文本聊天）"""
@@ -427,14 +866,16 @@ class ConversationManager:
             turn.assistant_response = clean_response
             turn.emotion_detected = emotion
             
-            # 设置情感动画
+            # 设置情感动画，与历史记录并发进行
+            animation_task = None
             if emotion and self.live2d_manager:
-                await self._set_emotion_animation(emotion)
+                animation_task = asyncio.create_task(self._set_emotion_animation(emotion))
             
             # 添加到历史
-            self.conversation_history.append(turn)
-            if len(self.conversation_history) > self.max_history_turns:
-                self.conversation_history = self.conversation_history[-self.max_history_turns:]
+            self._submit_turn(turn, notify=False)
+            
+            if animation_task:
+                await self._finish_emotion_animation(animation_task)
             
             return clean_response
             
@@ -447,15 +888,31 @@ class ConversationManager:
         if self.state != new_state:
             old_state = self.state
             self.state = new_state
+            self._state_changed.set()
             self.logger.debug(f"对话状态变更: {old_state.value} -> {new_state.value}")
             
-            if self.on_state_changed:
-                self.on_state_changed(new_state)
+            self._fire(self.on_state_changed, new_state)
+    
+    def _fire(self, callback: Optional[Callable], *args):
+        """在事件循环的下一轮调用回调（协程回调创建任务），回调耗时不阻塞对话流程"""
+        if callback is None:
+            return
+        
+        if asyncio.iscoroutinefunction(callback):
+            task = asyncio.create_task(callback(*args))
+            self._callback_tasks.add(task)
+            task.add_done_callback(self._callback_tasks.discard)
+        else:
+            asyncio.get_running_loop().call_soon(callback, *args)
     
     # 公共接口
-    def get_conversation_history(self) -> List[ConversationTurn]:
-        """获取对话历史"""
-        return self.conversation_history.copy()
+    def get_conversation_history(self) -> Tuple[ConversationTurn, ...]:
+        """获取对话历史（只读快照）"""
+        return tuple(self.conversation_history)
+    
+    def iter_history(self) -> Iterator[ConversationTurn]:
+        """按时间顺序遍历对话历史，不复制；遍历期间历史发生变化会抛出 RuntimeError"""
+        return iter(self.conversation_history)
     
     def get_current_state(self) -> ConversationState:
         """获取当前状态"""
@@ -464,25 +921,32 @@ class ConversationManager:
     def clear_history(self):
         """清空对话历史"""
         self.conversation_history.clear()
+        self._ctx_history = []
+        self._ctx_blocks = frozenset()
         self.logger.info("对话历史已清空")
     
     async def interrupt_current_turn(self):
         """中断当前对话轮次"""
         try:
-            # 取消当前任务
-            if self._listening_task and not self._listening_task.done():
-                self._listening_task.cancel()
-            
-            if self._processing_task and not self._processing_task.done():
-                self._processing_task.cancel()
-            
-            if self._speaking_task and not self._speaking_task.done():
-                self._speaking_task.cancel()
+            # 取消当前任务，并等待它们的清理代码执行完毕后再重置状态
+            current = asyncio.current_task()
+            tasks = [
+                task for task in (self._listening_task, self._processing_task, self._speaking_task)
+                if task and not task.done() and task is not current
+            ]
+            for task in tasks:
+                task.cancel()
+            
+            # 取消尚未播放的句子合成
+            self._parallel_tts.cancel()
             
             # 停止音频播放
             if self.tts:
                 await self.tts.stop_playback()
             
+            if tasks:
+                await asyncio.gather(*tasks, return_exceptions=True)
+            
             # 重置状态
             self._current_turn = None
             self._set_state(ConversationState.IDLE)
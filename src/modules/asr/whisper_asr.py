@@ -4,12 +4,14 @@ Whisper ASR 模块 - 基于 Whisper 的语音识别和语音活动检测
 
 import asyncio
 import logging
+import os
 import numpy as np
 import torch
 import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 from typing import Optional, List, Dict, Any, Callable
-from dataclasses import dataclass
+from dataclasses import asdict, dataclass
 from pathlib import Path
 import io
 
@@ -23,6 +25,16 @@ try:
 except ImportError:
     logging.warning("语音识别相关库未安装，ASR 功能将受限")
 
+try:
+    from faster_whisper import WhisperModel as FasterWhisperModel
+    FASTER_WHISPER_AVAILABLE = True
+except ImportError:
+    FASTER_WHISPER_AVAILABLE = False
+
+
+# transcribe 前做 VAD 静音检查的最大音频时长（秒），更长的音频直接转录
+SILENCE_GATE_MAX_SECONDS = 30.0
+
 
 @dataclass 
 class TranscriptionResult:
@@ -34,6 +46,16 @@ class TranscriptionResult:
     processing_time: float
 
 
+@dataclass
+class ASRStats:
+    """识别统计（每次转录和 VAD 检测都会更新，使用属性访问代替字典键查找）"""
+    total_transcriptions: int = 0
+    total_processing_time: float = 0.0
+    average_processing_time: float = 0.0
+    vad_detections: int = 0
+    false_positives: int = 0
+
+
 @dataclass
 class VADResult:
     """语音活动检测结果"""
@@ -55,10 +77,19 @@ class WhisperASR:
     5. 中断检测（用于对话管理）
     """
     
-    def __init__(self, model_name: str = "base", vad_threshold: float = 0.5, device: str = "auto"):
+    def __init__(self, model_name: str = "base", vad_threshold: float = 0.5, device: str = "auto",
+                 compile_model: bool = True, backend: str = "faster_whisper",
+                 quantization: str = "int8_dynamic", vad_backend: str = "onnx"):
         self.model_name = model_name
         self.vad_threshold = vad_threshold
         self.device = self._get_device(device)
+        self.compile_model = compile_model
+        # 识别后端："faster_whisper"（CTranslate2 INT8 推理）或 "whisper"（PyTorch）
+        self.backend = backend
+        # PyTorch 后端在 CPU 上的量化方式："int8_dynamic"（Linear 层动态 INT8 量化）或 "none"
+        self.quantization = quantization
+        # VAD 推理后端："onnx"（ONNX Runtime，在 CPU 上运行）或 "torch"（PyTorch，在 self.device 上运行）
+        self.vad_backend = vad_backend
         
         self.logger = logging.getLogger(__name__)
         
@@ -67,16 +98,38 @@ class WhisperASR:
         self.vad_model: Optional[Any] = None
         self.processor: Optional[Any] = None
         self.asr_pipeline: Optional[Any] = None
+        self.faster_whisper_model: Optional[Any] = None
+        self._is_quantized = False
+        
+        # 转录推理固定在单个专用线程中执行：同一时间只有一次推理占用模型，
+        # 并发的转录请求（如提前识别）按顺序排队
+        self._infer_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="whisper-infer")
+        self._encoder_compiled = False
+        # 编译前的编码器，编译后的首次前向失败时恢复
+        self._eager_encoder: Optional[Any] = None
+        
+        # VAD 帧所在设备，加载模型时按后端确定
+        self._vad_device = "cpu"
+        
+        # VAD 帧上传：CUDA 上使用独立的拷贝流和可复用的锁页内存暂存区
+        self._h2d_stream: Optional[Any] = None
+        self._pinned_frames: Optional[Any] = None
+        # VAD 模型带有跨帧状态，暂存区也是共享的；监听和转录前的静音检查可能在不同线程同时运行
+        self._vad_lock = threading.Lock()
+        # 转录前的静音检查使用独立的 VAD 实例，整段语音不会混入实时监听的跨帧状态
+        self._gate_vad_model: Optional[Any] = None
         
         # VAD 相关
         self.vad_sample_rate = 16000
         self.vad_window_size = 512  # 32ms at 16kHz
         self.vad_hop_length = 256   # 16ms at 16kHz
         
-        # 缓冲区
-        self.audio_buffer: List[np.ndarray] = []
+        # 缓冲区：预分配的环形缓冲区，保存最近 max_buffer_duration 秒的音频，
+        # _ring_write 为下一个写入位置，_ring_filled 为有效采样数（在 config 之后分配）
         self.buffer_lock = threading.Lock()
         self.max_buffer_duration = 30.0  # 最大缓冲30秒
+        self._ring_write = 0
+        self._ring_filled = 0
         
         # 实时处理
         self.is_processing = False
@@ -97,6 +150,8 @@ class WhisperASR:
             "condition_on_previous_text": False
         }
         
+        self._ring = np.empty(int(self.max_buffer_duration * self.config["sample_rate"]), dtype=np.float32)
+        
         # 语言映射
         self.language_mapping = {
             "zh": "chinese",
@@ -107,13 +162,7 @@ class WhisperASR:
         }
         
         # 统计信息
-        self.stats = {
-            "total_transcriptions": 0,
-            "total_processing_time": 0.0,
-            "average_processing_time": 0.0,
-            "vad_detections": 0,
-            "false_positives": 0
-        }
+        self.stats = ASRStats()
         
         # 回调函数
         self.on_speech_detected: Optional[Callable[[np.ndarray], None]] = None
@@ -160,6 +209,12 @@ class WhisperASR:
         try:
             self.logger.info(f"加载 Whisper 模型: {self.model_name}")
             
+            if self.backend == "faster_whisper":
+                if FASTER_WHISPER_AVAILABLE:
+                    await self._load_faster_whisper_model()
+                    return True
+                self.logger.warning("faster-whisper 未安装，使用 PyTorch Whisper")
+            
             # 使用 transformers 库加载模型（更好的 GPU 支持）
             if self.device == "cuda":
                 model_id = f"openai/whisper-{self.model_name}"
@@ -193,6 +248,13 @@ class WhisperASR:
                 # CPU 或 MPS 使用原始 whisper 库
                 self.whisper_model = whisper.load_model(self.model_name, device=self.device)
                 self.logger.info("使用原始 whisper 库加载模型")
+                
+                if self.device == "cpu" and self.quantization == "int8_dynamic":
+                    self._quantize_whisper_model()
+            
+            # 动态量化后的 Linear 层不经过 torch.compile，保持即时执行
+            if self.compile_model and not self._is_quantized:
+                self._compile_encoder()
             
             return True
             
@@ -200,25 +262,117 @@ class WhisperASR:
             self.logger.error(f"加载 Whisper 模型失败: {e}")
             return False
     
+    async def _load_faster_whisper_model(self):
+        """加载 CTranslate2 格式的 Whisper 模型（INT8 量化权重）"""
+        # CTranslate2 只支持 CUDA 和 CPU；CUDA 上权重 INT8、激活 FP16
+        if self.device == "cuda":
+            device, compute_type = "cuda", "int8_float16"
+        else:
+            device, compute_type = "cpu", "int8"
+        
+        loop = asyncio.get_event_loop()
+        self.faster_whisper_model = await loop.run_in_executor(
+            None,
+            lambda: FasterWhisperModel(self.model_name, device=device, compute_type=compute_type)
+        )
+        self.logger.info(f"使用 faster-whisper 加载模型 (device={device}, compute_type={compute_type})")
+    
+    def _quantize_whisper_model(self):
+        """将 CPU 上 Whisper 模型的 Linear 层动态量化为 INT8（权重预先量化，激活按批量化）"""
+        try:
+            self.whisper_model = torch.ao.quantization.quantize_dynamic(
+                self.whisper_model, {torch.nn.Linear}, dtype=torch.qint8
+            )
+            self._is_quantized = True
+            self.logger.info("Whisper 模型已启用 INT8 动态量化")
+            
+        except Exception as e:
+            self.logger.warning(f"Whisper 模型动态量化失败，使用 FP32: {e}")
+    
+    def _compile_encoder(self):
+        """
+        使用 torch.compile 编译 Whisper 编码器
+        
+        编码器输入固定为 30 秒梅尔谱，形状不变，适合图捕获；解码器逐 token 变长
+        且依赖 kv-cache 钩子，保持即时执行。首次编译在 _test_models 的静音转录中完成。
+        """
+        if not hasattr(torch, "compile") or self.device not in ("cuda", "cpu"):
+            return
+        
+        try:
+            # 编译产物持久化到项目目录，后续启动直接复用
+            os.environ.setdefault(
+                "TORCHINDUCTOR_CACHE_DIR", str(Path("resources/models/torchinductor").resolve())
+            )
+            
+            # CUDA 上使用 CUDA Graphs 消除逐层启动开销
+            mode = "reduce-overhead" if self.device == "cuda" else "default"
+            
+            owner = self._encoder_owner()
+            if owner is None:
+                return
+            
+            self._eager_encoder = owner.encoder
+            owner.encoder = torch.compile(owner.encoder, mode=mode)
+            
+            self._encoder_compiled = True
+            self.logger.info(f"Whisper 编码器已启用 torch.compile (mode={mode})")
+            
+        except Exception as e:
+            self.logger.warning(f"torch.compile 编译 Whisper 编码器失败，使用即时执行: {e}")
+    
+    def _encoder_owner(self) -> Optional[Any]:
+        """返回持有 encoder 属性的模型对象"""
+        if self.asr_pipeline is not None:
+            return self.asr_pipeline.model.model
+        return self.whisper_model
+    
+    def _restore_eager_encoder(self):
+        """撤销 torch.compile，换回编译前的编码器"""
+        owner = self._encoder_owner()
+        if owner is not None and self._eager_encoder is not None:
+            owner.encoder = self._eager_encoder
+        self._eager_encoder = None
+        self._encoder_compiled = False
+    
     async def _load_vad_model(self) -> bool:
         """加载 VAD 模型"""
         try:
             self.logger.info("加载 Silero VAD 模型")
             
-            # 加载预训练的 Silero VAD 模型
-            model, utils = torch.hub.load(
-                repo_or_dir='snakers4/silero-vad',
-                model='silero_vad',
-                force_reload=False,
-                onnx=False
-            )
+            # 加载预训练的 Silero VAD 模型；ONNX 版本的调用方式与 PyTorch 版本相同
+            # （输入 CPU 张量，返回语音概率），图已融合且没有 Python 逐层调度开销
+            use_onnx = self.vad_backend == "onnx"
+            
+            def load():
+                return torch.hub.load(
+                    repo_or_dir='snakers4/silero-vad',
+                    model='silero_vad',
+                    force_reload=False,
+                    onnx=use_onnx
+                )
+            
+            model, utils = load()
+            gate_model, _ = load()
             
             self.vad_model = model
             self.vad_utils = utils
+            self._gate_vad_model = gate_model
+            
+            if use_onnx:
+                self._vad_device = "cpu"
+            else:
+                # 移动到指定设备
+                for vad_model in (self.vad_model, self._gate_vad_model):
+                    vad_model.to(self.device)
+                    vad_model.eval()
+                self._vad_device = self.device
+                
+                # CUDA 上音频帧经锁页内存在独立的流上传
+                if self.device == "cuda":
+                    self._h2d_stream = torch.cuda.Stream()
             
-            # 移动到指定设备
-            self.vad_model.to(self.device)
-            self.vad_model.eval()
+            self.logger.info(f"Silero VAD 后端: {'onnx' if use_onnx else 'torch'} ({self._vad_device})")
             
             self.logger.info("Silero VAD 模型加载完成")
             return True
@@ -227,6 +381,7 @@ class WhisperASR:
             self.logger.error(f"加载 VAD 模型失败: {e}")
             # VAD 失败不阻止整个系统
             self.vad_model = None
+            self._gate_vad_model = None
             return True
     
     async def _test_models(self) -> bool:
@@ -240,8 +395,18 @@ class WhisperASR:
                 vad_result = await self.detect_voice_activity(test_audio)
                 self.logger.debug(f"VAD 测试结果: {vad_result.is_speech}")
             
-            # 测试 Whisper
-            transcription = await self.transcribe(test_audio)
+            # 测试 Whisper：直接调用识别后端（transcribe 的预处理会把静音整段去掉，模型不会运行）。
+            # 编码器经过 torch.compile 时首次调用触发编译，CUDA Graphs 还需再运行一次才完成捕获
+            try:
+                transcription = await self._warmup_whisper(test_audio)
+            except Exception as e:
+                if not self._encoder_compiled:
+                    raise
+                # 缺少 triton、C++ 编译工具链等问题要到首次前向时才暴露；编译只是加速，
+                # 失败时换回即时执行的编码器重新预热，不让初始化失败
+                self.logger.warning(f"torch.compile 编译的编码器预热失败，改用即时执行: {e}")
+                self._restore_eager_encoder()
+                transcription = await self._warmup_whisper(test_audio)
             self.logger.debug(f"Whisper 测试结果: '{transcription.text}'")
             
             return True
@@ -250,6 +415,13 @@ class WhisperASR:
             self.logger.error(f"模型测试失败: {e}")
             return False
     
+    async def _warmup_whisper(self, test_audio: np.ndarray) -> TranscriptionResult:
+        """运行识别后端预热，返回最后一次的结果"""
+        warmup_runs = 2 if self._encoder_compiled else 1
+        for _ in range(warmup_runs):
+            transcription = await self._transcribe_backend(test_audio, "auto")
+        return transcription
+    
     async def detect_voice_activity(self, audio_data: np.ndarray) -> VADResult:
         """检测语音活动"""
         try:
@@ -273,24 +445,16 @@ class WhisperASR:
             if len(audio_data) == 0:
                 return VADResult(False, 0.0, 0.0, 0.0)
             
-            # 转换为 tensor
-            audio_tensor = torch.from_numpy(audio_data).float().to(self.device)
-            
-            # 使用 VAD 模型检测
-            with torch.no_grad():
-                speech_probs = self.vad_model(audio_tensor, self.vad_sample_rate)
-            
-            # 计算置信度
-            if isinstance(speech_probs, torch.Tensor):
-                confidence = float(speech_probs.max().cpu())
-            else:
-                confidence = float(speech_probs)
+            # Silero VAD 每次只接受 vad_window_size 个采样，整个窗口切帧后在一次线程调用中
+            # 依次送入模型（模型带有跨帧状态，帧必须按顺序处理），取各帧最大概率
+            loop = asyncio.get_running_loop()
+            confidence = await loop.run_in_executor(None, self._vad_max_probability, audio_data)
             
             is_speech = confidence > self.vad_threshold
             duration = len(audio_data) / self.vad_sample_rate
             
             # 更新统计
-            self.stats["vad_detections"] += 1
+            self.stats.vad_detections += 1
             
             return VADResult(
                 is_speech=is_speech,
@@ -303,33 +467,108 @@ class WhisperASR:
             self.logger.error(f"语音活动检测失败: {e}")
             return VADResult(False, 0.0, 0.0, 0.0)
     
-    async def transcribe(self, audio_data: np.ndarray, language: str = "auto") -> TranscriptionResult:
-        """转录音频"""
+    def _vad_max_probability(self, audio_data: np.ndarray) -> float:
+        """按 vad_window_size 切帧运行 VAD 模型，返回各帧语音概率的最大值"""
+        # 一次性上传全部帧；各帧概率留在设备上，最后只同步一次
+        with self._vad_lock, torch.inference_mode():
+            frames_tensor = self._vad_frames(audio_data)
+            probs = torch.stack([
+                self.vad_model(frame, self.vad_sample_rate).reshape(()) for frame in frames_tensor
+            ])
+            return float(probs.max())
+    
+    def _vad_contains_speech(self, audio_data: np.ndarray) -> bool:
+        """用静音检查专用的 VAD 实例逐帧检测整段语音，遇到第一个语音帧即返回 True"""
+        model = self._gate_vad_model
+        with self._vad_lock, torch.inference_mode():
+            # 每段语音从初始状态开始检测
+            model.reset_states()
+            frames_tensor = self._vad_frames(audio_data)
+            for frame in frames_tensor:
+                if float(model(frame, self.vad_sample_rate)) > self.vad_threshold:
+                    return True
+        return False
+    
+    def _vad_frames(self, audio_data: np.ndarray):
+        """将音频切成 vad_window_size 采样的帧并上传到设备（不足一帧的尾部补零）"""
+        frame_size = self.vad_window_size
+        n_frames = -(-len(audio_data) // frame_size)
+        
+        if self._h2d_stream is not None:
+            return self._upload_vad_frames(audio_data, n_frames)
+        
+        frames = np.zeros((n_frames, frame_size), dtype=np.float32)
+        frames.reshape(-1)[:len(audio_data)] = audio_data
+        return torch.from_numpy(frames).to(self._vad_device)
+    
+    def _upload_vad_frames(self, audio_data: np.ndarray, n_frames: int):
+        """
+        经锁页内存在拷贝流上异步上传 VAD 帧
+        
+        暂存区按需增长后复用。每次检测都会读取概率值并同步设备，
+        下一次写入暂存区时上一次的拷贝必定已经完成
+        """
+        size = n_frames * self.vad_window_size
+        if self._pinned_frames is None or self._pinned_frames.numel() < size:
+            self._pinned_frames = torch.empty(size, dtype=torch.float32, pin_memory=True)
+        
+        staging = self._pinned_frames[:size]
+        host = staging.numpy()
+        host[:len(audio_data)] = audio_data
+        host[len(audio_data):] = 0.0
+        
+        with torch.cuda.stream(self._h2d_stream):
+            frames_tensor = staging.view(n_frames, self.vad_window_size).to(self.device, non_blocking=True)
+        
+        # 计算流等待拷贝完成；标记张量在计算流上使用，避免被缓存分配器提前回收
+        compute_stream = torch.cuda.current_stream()
+        compute_stream.wait_stream(self._h2d_stream)
+        frames_tensor.record_stream(compute_stream)
+        return frames_tensor
+    
+    async def transcribe(self, audio_data: np.ndarray, language: str = "auto",
+                         skip_silent: bool = True) -> TranscriptionResult:
+        """
+        转录音频
+        
+        skip_silent 为 True 且 VAD 模型可用时，先用 VAD 检查不超过 30 秒的音频，
+        没有语音则直接返回空结果，不运行 Whisper。调用方已经用 VAD 确认过是语音时
+        应传入 skip_silent=False
+        """
         start_time = time.time()
         
         try:
+            if skip_silent and self._gate_vad_model is not None and audio_data.ndim == 1 \
+                    and len(audio_data) <= SILENCE_GATE_MAX_SECONDS * self.config["sample_rate"]:
+                # 第一个 await 之前复制出独立的 float32 数组：传入的可能是环形缓冲区的视图，
+                # 检查期间新写入的音频会覆盖它
+                if np.issubdtype(audio_data.dtype, np.integer):
+                    audio_data = audio_data.astype(np.float32) * (1.0 / 32768.0)
+                else:
+                    audio_data = audio_data.astype(np.float32)
+                
+                loop = asyncio.get_running_loop()
+                if not await loop.run_in_executor(None, self._vad_contains_speech, audio_data):
+                    self.logger.debug("VAD 未检测到语音，跳过转录")
+                    return TranscriptionResult("", 0.0, [], "en", time.time() - start_time)
+            
             # 预处理音频
             processed_audio = self._preprocess_audio(audio_data)
             
             if len(processed_audio) == 0:
                 return TranscriptionResult("", 0.0, [], "en", 0.0)
             
-            # 选择转录方法
-            if self.asr_pipeline:
-                result = await self._transcribe_with_pipeline(processed_audio, language)
-            else:
-                result = await self._transcribe_with_whisper(processed_audio, language)
+            result = await self._transcribe_backend(processed_audio, language)
             
             # 计算处理时间
             processing_time = time.time() - start_time
             result.processing_time = processing_time
             
             # 更新统计
-            self.stats["total_transcriptions"] += 1
-            self.stats["total_processing_time"] += processing_time
-            self.stats["average_processing_time"] = (
-                self.stats["total_processing_time"] / self.stats["total_transcriptions"]
-            )
+            stats = self.stats
+            stats.total_transcriptions += 1
+            stats.total_processing_time += processing_time
+            stats.average_processing_time = stats.total_processing_time / stats.total_transcriptions
             
             # 触发回调
             if self.on_transcription_ready:
@@ -349,9 +588,16 @@ class WhisperASR:
             if len(audio_data.shape) > 1:
                 audio_data = audio_data.mean(axis=1)
             
-            # 标准化音频
-            if np.max(np.abs(audio_data)) > 0:
-                audio_data = audio_data / np.max(np.abs(audio_data))
+            # 转为 float32（整型 PCM 先缩放到 [-1, 1]，避免 int16 取绝对值溢出）
+            if np.issubdtype(audio_data.dtype, np.integer):
+                audio_data = audio_data.astype(np.float32) * (1.0 / 32768.0)
+            else:
+                audio_data = audio_data.astype(np.float32, copy=False)
+            
+            # 标准化音频（峰值只计算一次）
+            peak = np.abs(audio_data).max() if len(audio_data) else 0.0
+            if peak > 0:
+                audio_data = audio_data * (1.0 / peak)
             
             # 移除静音段
             # 简单的能量阈值方法
@@ -359,24 +605,31 @@ class WhisperASR:
             frame_length = 1024
             hop_length = 512
             
-            # 计算每帧能量
-            frames = []
-            for i in range(0, len(audio_data) - frame_length, hop_length):
-                frame = audio_data[i:i + frame_length]
-                energy = np.mean(frame ** 2)
-                
-                if energy > energy_threshold:
-                    frames.extend(frame)
-            
-            if len(frames) == 0:
+            # 分帧视图（不复制数据），帧起点为 0, hop, ...，且小于 len - frame_length
+            n_frames = -(-(len(audio_data) - frame_length) // hop_length)
+            if n_frames <= 0:
                 return np.array([], dtype=np.float32)
+            frames = np.lib.stride_tricks.sliding_window_view(audio_data, frame_length)[::hop_length][:n_frames]
+            
+            # 一次计算每帧能量，保留高于阈值的帧
+            energies = np.einsum('ij,ij->i', frames, frames) * (1.0 / frame_length)
+            voiced = frames[energies > energy_threshold]
             
-            return np.array(frames, dtype=np.float32)
+            return voiced.reshape(-1)
             
         except Exception as e:
             self.logger.error(f"音频预处理失败: {e}")
             return audio_data
     
+    async def _transcribe_backend(self, audio_data: np.ndarray, language: str) -> TranscriptionResult:
+        """选择已加载的识别后端转录"""
+        if self.faster_whisper_model:
+            return await self._transcribe_with_faster_whisper(audio_data, language)
+        elif self.asr_pipeline:
+            return await self._transcribe_with_pipeline(audio_data, language)
+        else:
+            return await self._transcribe_with_whisper(audio_data, language)
+    
     async def _transcribe_with_pipeline(self, audio_data: np.ndarray, language: str) -> TranscriptionResult:
         """使用 transformers pipeline 转录"""
         try:
@@ -395,11 +648,11 @@ class WhisperASR:
                 "return_timestamps": self.config["return_timestamps"]
             }
             
-            # 在线程池中运行推理
-            loop = asyncio.get_event_loop()
+            # 在专用推理线程中运行
+            loop = asyncio.get_running_loop()
             result = await loop.run_in_executor(
-                None,
-                lambda: self.asr_pipeline(inputs, generate_kwargs=generate_kwargs)
+                self._infer_executor,
+                lambda: self._run_inference(self.asr_pipeline, inputs, generate_kwargs=generate_kwargs)
             )
             
             # 解析结果
@@ -442,11 +695,11 @@ class WhisperASR:
                 "condition_on_previous_text": self.config["condition_on_previous_text"]
             }
             
-            # 在线程池中运行推理
-            loop = asyncio.get_event_loop()
+            # 在专用推理线程中运行
+            loop = asyncio.get_running_loop()
             result = await loop.run_in_executor(
-                None,
-                lambda: self.whisper_model.transcribe(audio_data, **options)
+                self._infer_executor,
+                lambda: self._run_inference(self.whisper_model.transcribe, audio_data, **options)
             )
             
             # 解析结果
@@ -482,19 +735,63 @@ class WhisperASR:
             self.logger.error(f"Whisper 转录失败: {e}")
             raise
     
+    @staticmethod
+    def _run_inference(fn: Callable, *args, **kwargs):
+        """在 inference_mode 下运行 PyTorch 推理（该模式按线程生效，须在执行推理的线程内进入）"""
+        with torch.inference_mode():
+            return fn(*args, **kwargs)
+    
+    async def _transcribe_with_faster_whisper(self, audio_data: np.ndarray, language: str) -> TranscriptionResult:
+        """使用 faster-whisper 模型转录"""
+        try:
+            options = {
+                "language": None if language == "auto" else language,
+                "beam_size": self.config["beam_size"],
+                "patience": self.config["patience"],
+                "temperature": self.config["temperature"],
+                "compression_ratio_threshold": self.config["compression_ratio_threshold"],
+                "log_prob_threshold": self.config["logprob_threshold"],
+                "no_speech_threshold": self.config["no_speech_threshold"],
+                "condition_on_previous_text": self.config["condition_on_previous_text"]
+            }
+            
+            def run():
+                # transcribe 返回惰性生成器，解码在遍历时进行，需在线程池中一并取完
+                segments, info = self.faster_whisper_model.transcribe(audio_data, **options)
+                return list(segments), info
+            
+            # 在线程池中运行推理
+            loop = asyncio.get_running_loop()
+            segments_raw, info = await loop.run_in_executor(self._infer_executor, run)
+            
+            segments = [
+                {"text": seg.text, "start": seg.start, "end": seg.end}
+                for seg in segments_raw
+            ]
+            text = "".join(seg.text for seg in segments_raw).strip()
+            
+            # 将 log 概率转换为置信度 (简化)
+            avg_confidence = 0.0
+            if segments_raw:
+                avg_confidence = float(np.exp(np.mean([seg.avg_logprob for seg in segments_raw])))
+            
+            return TranscriptionResult(
+                text=text,
+                confidence=max(0.0, min(1.0, avg_confidence)),
+                segments=segments,
+                language=info.language,
+                processing_time=0.0  # 在外部计算
+            )
+            
+        except Exception as e:
+            self.logger.error(f"faster-whisper 转录失败: {e}")
+            raise
+    
     async def process_audio_stream(self, audio_chunk: np.ndarray) -> Optional[TranscriptionResult]:
         """处理音频流（实时处理）"""
         try:
-            # 添加到缓冲区
-            with self.buffer_lock:
-                self.audio_buffer.append(audio_chunk)
-                
-                # 限制缓冲区大小
-                total_duration = sum(len(chunk) for chunk in self.audio_buffer) / self.config["sample_rate"]
-                
-                while total_duration > self.max_buffer_duration and len(self.audio_buffer) > 1:
-                    removed_chunk = self.audio_buffer.pop(0)
-                    total_duration -= len(removed_chunk) / self.config["sample_rate"]
+            # 添加到缓冲区，超过上限时覆盖最早的音频
+            self._ring_append(audio_chunk)
             
             # 检测语音活动
             vad_result = await self.detect_voice_activity(audio_chunk)
@@ -526,14 +823,12 @@ class WhisperASR:
             # 等待一段时间收集更多音频
             await asyncio.sleep(0.5)
             
-            # 合并缓冲区中的音频
-            with self.buffer_lock:
-                if not self.audio_buffer:
-                    self.is_processing = False
-                    return
-                
-                combined_audio = np.concatenate(self.audio_buffer)
-                self.audio_buffer.clear()
+            # 取出缓冲区中的音频（未回绕时为视图；transcribe 在首个 await 之前就把它复制或
+            # 预处理成新数组，因此视图在后续写入覆盖之前已经用完）
+            combined_audio = self._ring_take()
+            if combined_audio is None:
+                self.is_processing = False
+                return
             
             # 进行转录
             if len(combined_audio) > 0:
@@ -548,12 +843,51 @@ class WhisperASR:
         finally:
             self.is_processing = False
     
+    def _ring_append(self, audio_chunk: np.ndarray):
+        """写入环形缓冲区，需要时分两段写入回绕位置"""
+        ring = self._ring
+        size = len(ring)
+        chunk = audio_chunk.reshape(-1)[-size:]
+        n = len(chunk)
+        
+        with self.buffer_lock:
+            start = self._ring_write
+            first = min(n, size - start)
+            ring[start:start + first] = chunk[:first]
+            if first < n:
+                ring[:n - first] = chunk[first:]
+            
+            self._ring_write = (start + n) % size
+            self._ring_filled = min(self._ring_filled + n, size)
+    
+    def _ring_take(self) -> Optional[np.ndarray]:
+        """按时间顺序取出缓冲区中的全部音频并清空，缓冲区为空时返回 None"""
+        with self.buffer_lock:
+            filled, end = self._ring_filled, self._ring_write
+            self._ring_filled = self._ring_write = 0
+        
+        if not filled:
+            return None
+        
+        start = end - filled
+        if start >= 0:
+            return self._ring[start:end]
+        return np.concatenate((self._ring[start:], self._ring[:end]))
+    
     # 公共接口
     async def transcribe_file(self, file_path: str, language: str = "auto") -> TranscriptionResult:
         """转录音频文件"""
         try:
-            # 使用 librosa 加载音频
-            audio_data, sr = librosa.load(file_path, sr=self.config["sample_rate"], mono=True)
+            sample_rate = self.config["sample_rate"]
+            info = sf.info(file_path)
+            
+            if info.samplerate == sample_rate and info.channels == 1:
+                # 已是目标采样率的单声道音频，直接读取，不经过重采样
+                audio_data, _ = sf.read(file_path, dtype="float32")
+            else:
+                # 格式不符时用 librosa 重采样（多相滤波比默认的 soxr_hq/kaiser_best 快）
+                audio_data, _ = librosa.load(file_path, sr=sample_rate, mono=True, res_type="polyphase")
+            
             return await self.transcribe(audio_data, language)
             
         except Exception as e:
@@ -570,17 +904,11 @@ class WhisperASR:
     
     def get_stats(self) -> Dict[str, Any]:
         """获取统计信息"""
-        return self.stats.copy()
+        return asdict(self.stats)
     
     def reset_stats(self):
         """重置统计信息"""
-        self.stats = {
-            "total_transcriptions": 0,
-            "total_processing_time": 0.0,
-            "average_processing_time": 0.0,
-            "vad_detections": 0,
-            "false_positives": 0
-        }
+        self.stats = ASRStats()
     
     async def cleanup(self):
         """清理资源"""
@@ -593,19 +921,23 @@ class WhisperASR:
                 except asyncio.CancelledError:
                     pass
             
+            # 关闭推理线程，不等待正在进行的推理
+            self._infer_executor.shutdown(wait=False)
+            
             # 清理模型
             if hasattr(self, 'whisper_model') and self.whisper_model:
                 del self.whisper_model
             
             if hasattr(self, 'vad_model') and self.vad_model:
                 del self.vad_model
+            self._gate_vad_model = None
             
             if hasattr(self, 'asr_pipeline') and self.asr_pipeline:
                 del self.asr_pipeline
             
             # 清理缓冲区
             with self.buffer_lock:
-                self.audio_buffer.clear()
+                self._ring_filled = self._ring_write = 0
             
             # 强制垃圾回收
             import gc
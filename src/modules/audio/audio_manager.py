@@ -8,7 +8,7 @@ import numpy as np
 import pyaudio
 import threading
 import queue
-from typing import Optional, Callable, List, Union, Any
+from typing import Optional, Callable, List, Tuple, Union, Any
 from loguru import logger
 import time
 import wave
@@ -43,6 +43,9 @@ class AudioManager:
         # 回调函数
         self.on_audio_data: Optional[Callable[[bytes], None]] = None
         
+        # 异步订阅者：(事件循环, 队列)，输入回调直接把音频块投递到各自的事件循环
+        self._chunk_subscribers: List[Tuple[asyncio.AbstractEventLoop, asyncio.Queue]] = []
+        
         logger.info("音频管理器初始化")
 
     async def initialize(self):
@@ -189,8 +192,15 @@ class AudioManager:
         """音频输入回调"""
         if self.recording and in_data:
             try:
-                # 将音频数据放入队列
-                self.audio_queue.put(in_data)
+                subscribers = self._chunk_subscribers
+                if subscribers:
+                    # 通知异步订阅者
+                    for loop, chunk_queue in subscribers:
+                        loop.call_soon_threadsafe(self._deliver_chunk, chunk_queue, in_data)
+                else:
+                    # 没有订阅者时放入队列，由 capture_audio 等同步读取接口取走；
+                    # 有订阅者时不再入队，否则队列无人消费会随会话时长一直增长
+                    self.audio_queue.put(in_data)
                 
                 # 触发回调
                 if self.on_audio_data:
@@ -266,6 +276,34 @@ class AudioManager:
             logger.error(f"捕获音频失败: {e}")
             return None
 
+    def subscribe_chunks(self, loop: asyncio.AbstractEventLoop, maxsize: int = 0) -> asyncio.Queue:
+        """
+        订阅录音音频块
+        
+        Args:
+            loop: 消费队列的事件循环
+            maxsize: 队列上限，0 表示不限；队列满时丢弃最旧的音频块
+            
+        Returns:
+            接收音频块的队列，由输入回调线程安全地写入
+        """
+        chunk_queue: asyncio.Queue = asyncio.Queue(maxsize=maxsize)
+        self._chunk_subscribers = self._chunk_subscribers + [(loop, chunk_queue)]
+        return chunk_queue
+
+    @staticmethod
+    def _deliver_chunk(chunk_queue: asyncio.Queue, in_data: bytes):
+        """在订阅者的事件循环中写入音频块，队列满时丢弃最旧的块"""
+        if chunk_queue.full():
+            chunk_queue.get_nowait()
+        chunk_queue.put_nowait(in_data)
+
+    def unsubscribe_chunks(self, chunk_queue: asyncio.Queue):
+        """取消订阅录音音频块"""
+        self._chunk_subscribers = [
+            (loop, q) for loop, q in self._chunk_subscribers if q is not chunk_queue
+        ]
+
     async def get_audio_chunk(self, timeout: float = 0.1) -> Optional[bytes]:
         """
         获取一个音频块
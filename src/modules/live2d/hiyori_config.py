@@ -10,6 +10,12 @@ from typing import Dict, List, Any, Optional, Union
 from dataclasses import dataclass
 from loguru import logger
 
+# 优先使用 libyaml 的 C 解析器
+try:
+    from yaml import CSafeLoader as YamlLoader
+except ImportError:
+    from yaml import SafeLoader as YamlLoader
+
 
 @dataclass
 class ParameterConfig:
@@ -133,7 +139,7 @@ class HiyoriConfig:
                 return False
             
             with open(self.config_path, 'r', encoding='utf-8') as f:
-                self.raw_config = yaml.safe_load(f)
+                self.raw_config = yaml.load(f, Loader=YamlLoader)
             
             # 解析各个配置项
             self._parse_model_config()
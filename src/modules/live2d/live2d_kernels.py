@@ -0,0 +1,61 @@
+"""
+Live2D 每帧数值计算内核
+参数平滑和呼吸波形在预分配的 numpy 数组上原地计算，安装了 numba 时编译为本地代码，
+否则直接以 numpy 向量运算执行。设置环境变量 PERSONA_JIT=0 可跳过编译（开发调试时省去预热）
+"""
+
+import logging
+import os
+
+import numpy as np
+
+# 控制是否启用 JIT 的环境变量，须在导入本模块之前设置
+JIT_ENV_VAR = "PERSONA_JIT"
+
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = True
+except ImportError:
+    logging.warning("numba 未安装，Live2D 帧计算将使用 numpy 执行")
+    NUMBA_AVAILABLE = False
+
+JIT_ENABLED = NUMBA_AVAILABLE and os.environ.get(JIT_ENV_VAR, "1") != "0"
+
+
+def optional_jit(**options):
+    """启用 JIT 时用 numba 编译（带磁盘缓存），否则原样返回函数"""
+    def decorator(func):
+        if not JIT_ENABLED:
+            return func
+        return njit(cache=True, **options)(func)
+    return decorator
+
+
+@optional_jit(fastmath=True)
+def smooth_parameters(current: np.ndarray, targets: np.ndarray, factor: float):
+    """参数向目标值线性插值，结果原地写回 current"""
+    current += (targets - current) * factor
+
+
+@optional_jit(fastmath=True)
+def breathing_values(defaults: np.ndarray, amplitudes: np.ndarray, cycles: np.ndarray,
+                     t: float, out: np.ndarray):
+    """计算呼吸参数值（默认值 + 正弦波），结果写入 out"""
+    out[:] = defaults + amplitudes * np.sin(2.0 * np.pi * t / cycles)
+
+
+# 内核的显式类型签名：预热时按签名直接编译，跳过对示例参数的类型推断，
+# 也保证只生成这一种特化（参数均为 C 连续的 float64 数组）
+KERNEL_SIGNATURES = (
+    (smooth_parameters, "void(float64[::1], float64[::1], float64)"),
+    (breathing_values, "void(float64[::1], float64[::1], float64[::1], float64, float64[::1])"),
+)
+
+
+def warmup():
+    """按显式签名编译每个内核（已有磁盘缓存时直接加载）"""
+    if not JIT_ENABLED:
+        return
+    
+    for kernel, signature in KERNEL_SIGNATURES:
+        kernel.compile(signature)
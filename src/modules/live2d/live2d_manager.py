@@ -24,6 +24,7 @@ except ImportError:
 from live2d.v3 import LAppModel, Model, init, dispose, glInit, glRelease  # 导入 live2d-py 相关模块
 
 from .hiyori_config import HiyoriConfig
+from .live2d_kernels import smooth_parameters, breathing_values
 
 
 class AnimationPriority(Enum):
@@ -105,6 +106,12 @@ class Live2DManager:
         self.parameters: Dict[str, float] = {}  # 参数名 -> 当前值
         self.parameter_targets: Dict[str, float] = {}  # 目标参数值（用于平滑过渡）
         
+        # 每帧计算使用的参数数组（在参数映射初始化时按模型参数顺序填充）
+        self._param_index: Dict[str, int] = {}  # 参数名 -> 数组下标
+        self._param_ids: List[str] = []
+        self._param_current = np.zeros(0, dtype=np.float64)
+        self._param_targets = np.zeros(0, dtype=np.float64)
+        
         # 渲染相关
         self.texture_handles: List[int] = []
         self.shader_program: Optional[int] = None
@@ -137,6 +144,21 @@ class Live2DManager:
         self.breathing_parameters = breathing_config.parameters
         self.breathing_time = 0.0
         
+        # 呼吸参数预先展开为数组，每帧只计算波形
+        breathing_params = [p for p in self.breathing_parameters if p.get("name")]
+        self._breath_names = [p["name"] for p in breathing_params]
+        self._breath_defaults = np.array(
+            [self.hiyori_config.get_parameter_default(name) or 0.0 for name in self._breath_names],
+            dtype=np.float64
+        )
+        self._breath_amplitudes = np.array(
+            [p.get("amplitude", 0.5) for p in breathing_params], dtype=np.float64
+        )
+        self._breath_cycles = np.array(
+            [p.get("cycle", 3.0) for p in breathing_params], dtype=np.float64
+        )
+        self._breath_values = np.zeros(len(self._breath_names), dtype=np.float64)
+        
         # 唇形同步
         self.phoneme_queue: List[PhonemeFrame] = []
         self.current_phoneme_time = 0.0
@@ -443,6 +465,12 @@ class Live2DManager:
                             self.vbridger_params[vb_param] = i
                             break
             
+            # 按参数顺序预分配每帧计算用的数组
+            self._param_ids = list(self.parameters)
+            self._param_index = {param_id: i for i, param_id in enumerate(self._param_ids)}
+            self._param_current = np.array(list(self.parameters.values()), dtype=np.float64)
+            self._param_targets = self._param_current.copy()
+            
             self.logger.info(f"初始化 {len(self.parameters)} 个参数映射")
             
         except Exception as e:
@@ -599,21 +627,18 @@ class Live2DManager:
             return
         
         try:
-            for breath_param in self.breathing_parameters:
-                param_name = breath_param.get("name")
-                amplitude = breath_param.get("amplitude", 0.5)
-                cycle = breath_param.get("cycle", 3.0)
-                
-                if param_name:
-                    # 计算呼吸值（正弦波）
-                    breath_value = amplitude * math.sin(2 * math.pi * self.breathing_time / cycle)
-                    
-                    # 获取参数的默认值
-                    default_value = self.hiyori_config.get_parameter_default(param_name) or 0.0
-                    
-                    # 应用呼吸效果
-                    final_value = default_value + breath_value
-                    self._set_parameter(param_name, final_value)
+            # 计算呼吸值（默认值 + 正弦波）
+            breathing_values(
+                self._breath_defaults,
+                self._breath_amplitudes,
+                self._breath_cycles,
+                self.breathing_time,
+                self._breath_values
+            )
+            
+            # 应用呼吸效果
+            for param_name, value in zip(self._breath_names, self._breath_values.tolist()):
+                self._set_parameter(param_name, value)
         
         except Exception as e:
             self.logger.error(f"更新呼吸效果失败: {e}")
@@ -626,17 +651,12 @@ class Live2DManager:
         try:
             smoothing_factor = min(delta_time * 5.0, 1.0)  # 平滑因子
             
-            for param_name, target_value in self.parameter_targets.items():
-                current_value = self.parameter_values.get(param_name, 0.0)
-                
-                # 线性插值
-                new_value = current_value + (target_value - current_value) * smoothing_factor
-                
-                self.parameter_values[param_name] = new_value
-                
-                # 实际设置参数（如果有 SDK）
-                # if self._model_handle:
-                #     self._cubism_lib.SetParameterValue(self._model_handle, param_index, new_value)
+            # 线性插值，在预分配数组上原地计算
+            smooth_parameters(self._param_current, self._param_targets, smoothing_factor)
+            
+            # 实际设置参数（如果有 SDK）
+            # if self._model_handle:
+            #     self._cubism_lib.SetParameterValue(self._model_handle, param_index, new_value)
         
         except Exception as e:
             self.logger.error(f"更新参数平滑过渡失败: {e}")
@@ -647,8 +667,16 @@ class Live2DManager:
         # 由于没有实际的 SDK，这里只是示例结构
         pass
     
-    def render(self) -> Optional[np.ndarray]:
-        """渲染模型并返回帧数据使用 live2d-py 渲染"""
+    def render(self, out: Optional[np.ndarray] = None) -> Optional[np.ndarray]:
+        """
+        渲染模型并返回帧数据使用 live2d-py 渲染
+        
+        Args:
+            out: 可选的 (height, width, 4) uint8 缓冲区，像素直接读入其中，不再分配新数组
+            
+        Returns:
+            自上而下的 RGBA 帧（out 的翻转视图，或新数组的翻转视图）
+        """
         try:
             # 绑定帧缓冲
             gl.glBindFramebuffer(gl.GL_FRAMEBUFFER, self.frame_buffer)
@@ -666,13 +694,19 @@ class Live2DManager:
             
             # 读取帧数据
             gl.glBindFramebuffer(gl.GL_FRAMEBUFFER, self.frame_buffer)
-            frame_data = gl.glReadPixels(0, 0, self.width, self.height, 
-                                       gl.GL_RGBA, gl.GL_UNSIGNED_BYTE)
+            if out is not None:
+                gl.glReadPixels(0, 0, self.width, self.height,
+                                gl.GL_RGBA, gl.GL_UNSIGNED_BYTE, array=out)
+                frame_array = out
+            else:
+                frame_data = gl.glReadPixels(0, 0, self.width, self.height, 
+                                           gl.GL_RGBA, gl.GL_UNSIGNED_BYTE)
+                
+                # 转换为 numpy 数组
+                frame_array = np.frombuffer(frame_data, dtype=np.uint8)
+                frame_array = frame_array.reshape(self.height, self.width, 4)
             
-            # 转换为 numpy 数组
-            frame_array = np.frombuffer(frame_data, dtype=np.uint8)
-            frame_array = frame_array.reshape(self.height, self.width, 4)
-            frame_array = np.flipud(frame_array)  # OpenGL 坐标系翻转
+            frame_array = np.flipud(frame_array)  # OpenGL 坐标系翻转（视图，不复制）
             
             # 恢复默认帧缓冲
             gl.glBindFramebuffer(gl.GL_FRAMEBUFFER, 0)
@@ -712,6 +746,9 @@ class Live2DManager:
             if self.hiyori_config.performance.parameter_smoothing:
                 # 使用平滑过渡
                 self.parameter_targets[param_name] = value
+                index = self._param_index.get(param_name)
+                if index is not None:
+                    self._param_targets[index] = value
             else:
                 # 直接设置
                 if param_name not in self.parameters:
@@ -784,12 +821,41 @@ class Live2DManager:
         except Exception as e:
             self.logger.error(f"设置空闲动画失败: {e}")
     
-    async def sync_lipsync(self, phoneme_timing: List[PhonemeFrame]):
-        """同步唇形动画"""
+    async def sync_lipsync(self, phoneme_timing: List[Any], duration_sec: Optional[float] = None):
+        """
+        同步唇形动画
+        
+        Args:
+            phoneme_timing: 音素帧，或 TTS 给出的音素时间戳（带 start_time/end_time）
+            duration_sec: 对应语音的实际时长（秒），给出时把音素时间轴缩放到该时长
+        """
         try:
-            self.phoneme_queue.extend(phoneme_timing)
+            frames = []
+            if phoneme_timing and hasattr(phoneme_timing[0], "start_time"):
+                # TTS 的时序是按文本长度估算的，按实际音频时长缩放
+                track_end = phoneme_timing[-1].end_time
+                scale = duration_sec / track_end if duration_sec and track_end > 0 else 1.0
+                for item in phoneme_timing:
+                    frames.append(PhonemeFrame(
+                        time=item.start_time * scale,
+                        phoneme=item.phoneme,
+                        mouth_open_y=item.mouth_open_y,
+                        jaw_open=item.jaw_open,
+                        mouth_form=item.mouth_form,
+                        mouth_shrug=item.mouth_shrug,
+                        mouth_funnel=item.mouth_funnel,
+                        mouth_pucker_widen=item.mouth_pucker_widen,
+                        mouth_press_lip=item.mouth_press_lip,
+                        mouth_x=item.mouth_x,
+                        cheek_puff=item.cheek_puff
+                    ))
+            else:
+                frames.extend(phoneme_timing)
+            
+            # 新的语音从头计时，替换掉上一段剩余的音素帧
+            self.phoneme_queue = frames
             self.current_phoneme_time = 0.0
-            self.logger.debug(f"同步唇形动画，{len(phoneme_timing)} 个音素帧")
+            self.logger.debug(f"同步唇形动画，{len(frames)} 个音素帧")
         except Exception as e:
             self.logger.error(f"同步唇形动画失败: {e}")
     
@@ -815,11 +881,14 @@ class Live2DManager:
     
     def get_parameter_value(self, param_name: str) -> Optional[float]:
         """获取参数当前值"""
-        return self.parameter_values.get(param_name)
+        index = self._param_index.get(param_name)
+        if index is None:
+            return None
+        return float(self._param_current[index])
     
     def get_all_parameter_values(self) -> Dict[str, float]:
         """获取所有参数的当前值"""
-        return self.parameter_values.copy()
+        return dict(zip(self._param_ids, self._param_current.tolist()))
     
     def validate_config(self) -> List[str]:
         """验证配置有效性"""
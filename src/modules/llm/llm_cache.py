@@ -0,0 +1,517 @@
+"""
+LLM 响应缓存
+对确定性请求（temperature=0）按请求内容缓存回复，重复提问时跳过网络请求；
+语义缓存层对意思相近的提问复用回复
+"""
+
+import asyncio
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Protocol, Tuple, Union, AsyncIterator
+from loguru import logger
+import numpy as np
+
+from .llm_client import LLMClient
+
+
+class CacheBackend(Protocol):
+    """缓存后端接口"""
+
+    async def get(self, key: str) -> Optional[str]:
+        ...
+
+    async def set(self, key: str, value: str, ttl_seconds: float):
+        ...
+
+    async def clear(self):
+        ...
+
+
+class MemoryCacheBackend:
+    """进程内 LRU 缓存"""
+
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+
+    async def get(self, key: str) -> Optional[str]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            return None
+
+        self._entries.move_to_end(key)
+        return value
+
+    async def set(self, key: str, value: str, ttl_seconds: float):
+        self._entries[key] = (time.monotonic() + ttl_seconds, value)
+        self._entries.move_to_end(key)
+
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def clear(self):
+        self._entries.clear()
+
+
+class RedisCacheBackend:
+    """Redis 缓存（需要安装 redis 库），可在多个进程间共享"""
+
+    def __init__(self, url: str = "redis://localhost:6379/0", prefix: str = "llm_cache:"):
+        import redis.asyncio as redis
+
+        self.prefix = prefix
+        self._redis = redis.from_url(url, decode_responses=True)
+
+    async def get(self, key: str) -> Optional[str]:
+        return await self._redis.get(self.prefix + key)
+
+    async def set(self, key: str, value: str, ttl_seconds: float):
+        await self._redis.set(self.prefix + key, value, ex=max(int(ttl_seconds), 1))
+
+    async def clear(self):
+        async for key in self._redis.scan_iter(match=self.prefix + "*"):
+            await self._redis.delete(key)
+
+
+class LLMCache:
+    """带响应缓存的 LLM 客户端包装，其余接口直接转发给原客户端"""
+
+    def __init__(self, client: LLMClient,
+                 backend: Optional[CacheBackend] = None,
+                 ttl_seconds: float = 3600.0):
+        self.client = client
+        self.backend = backend or MemoryCacheBackend()
+        self.ttl_seconds = ttl_seconds
+
+        self.cache_stats = {
+            "hits": 0,
+            "misses": 0
+        }
+
+    def __getattr__(self, name: str):
+        return getattr(self.client, name)
+
+    def _make_key(self, messages: List[Dict[str, str]], max_tokens: int,
+                  tools: Optional[List[Any]]) -> str:
+        """根据模型、消息和工具计算缓存键"""
+        payload = {
+            "provider": self.client.config.text_provider,
+            "model": self.client.config.text_model,
+            "messages": messages,
+            "max_tokens": max_tokens,
+            "tools": sorted(json.dumps(tool, sort_keys=True) for tool in tools or ()),
+        }
+        encoded = json.dumps(payload, sort_keys=True, ensure_ascii=False).encode("utf-8")
+        return hashlib.sha256(encoded).hexdigest()
+
+    async def chat_completion(self,
+                            messages: List[Dict[str, str]],
+                            max_tokens: int = 1000,
+                            temperature: float = 0.7,
+                            **kwargs) -> str:
+        """
+        发送聊天完成请求，temperature=0 时优先返回缓存的回复
+
+        Args:
+            messages: 对话消息列表
+            max_tokens: 最大令牌数
+            temperature: 温度参数
+            **kwargs: 其他参数
+
+        Returns:
+            模型回复的文本
+        """
+        # 非确定性请求不缓存
+        if temperature > 0:
+            return await self.client.chat_completion(messages, max_tokens, temperature, **kwargs)
+
+        key = self._make_key(messages, max_tokens, kwargs.get("tools"))
+
+        try:
+            cached = await self.backend.get(key)
+        except Exception as e:
+            logger.warning(f"读取LLM缓存失败: {e}")
+            cached = None
+
+        if cached is not None:
+            self.cache_stats["hits"] += 1
+            return cached
+
+        self.cache_stats["misses"] += 1
+        response = await self.client.chat_completion(messages, max_tokens, temperature, **kwargs)
+
+        # 失败时客户端返回空字符串，不缓存
+        if response:
+            try:
+                await self.backend.set(key, response, self.ttl_seconds)
+            except Exception as e:
+                logger.warning(f"写入LLM缓存失败: {e}")
+
+        return response
+
+    async def stream_chat_completion(self,
+                                   messages: List[Dict[str, str]],
+                                   max_tokens: int = 1000,
+                                   temperature: float = 0.7,
+                                   **kwargs) -> AsyncIterator[str]:
+        """
+        流式聊天完成请求，temperature=0 且命中缓存时一次产出完整回复
+
+        Args:
+            messages: 对话消息列表
+            max_tokens: 最大令牌数
+            temperature: 温度参数
+            **kwargs: 其他参数
+
+        Yields:
+            回复文本的增量片段
+        """
+        if temperature > 0:
+            async for delta in self.client.stream_chat_completion(messages, max_tokens, temperature, **kwargs):
+                yield delta
+            return
+
+        key = self._make_key(messages, max_tokens, kwargs.get("tools"))
+
+        try:
+            cached = await self.backend.get(key)
+        except Exception as e:
+            logger.warning(f"读取LLM缓存失败: {e}")
+            cached = None
+
+        if cached is not None:
+            self.cache_stats["hits"] += 1
+            yield cached
+            return
+
+        self.cache_stats["misses"] += 1
+        parts = []
+        errors_before = self.client.stats["errors"]
+        async for delta in self.client.stream_chat_completion(messages, max_tokens, temperature, **kwargs):
+            parts.append(delta)
+            yield delta
+
+        # 流中途失败时只收到部分回复，不缓存
+        response = "".join(parts)
+        if response and self.client.stats["errors"] == errors_before:
+            try:
+                await self.backend.set(key, response, self.ttl_seconds)
+            except Exception as e:
+                logger.warning(f"写入LLM缓存失败: {e}")
+
+    async def clear_cache(self):
+        """清空缓存"""
+        await self.backend.clear()
+        self.cache_stats = {
+            "hits": 0,
+            "misses": 0
+        }
+        logger.info("LLM缓存已清空")
+
+
+class SemanticLLMCache:
+    """
+    语义响应缓存：用户消息的句向量与已缓存的问题足够相似时直接复用回复，
+    未命中时交给精确缓存处理。需要安装 sentence-transformers，未安装时直接转发
+    """
+
+    def __init__(self, cache: LLMCache,
+                 model_name: str = "sentence-transformers/all-MiniLM-L6-v2",
+                 threshold: float = 0.92,
+                 max_entries: int = 512,
+                 max_contexts: int = 16,
+                 enabled: bool = True):
+        self.cache = cache
+        self.enabled = enabled
+        self.model_name = model_name
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.max_contexts = max_contexts
+
+        self._encoder = None
+        self._encoder_failed = False
+        self._encoder_lock = asyncio.Lock()
+
+        # 每个系统提示词一组条目：(归一化向量矩阵, 回复列表)，按插入顺序循环覆盖
+        self._entries: "OrderedDict[str, Tuple[np.ndarray, List[str]]]" = OrderedDict()
+        self._write_index: Dict[str, int] = {}
+
+        self.semantic_stats = {
+            "hits": 0,
+            "misses": 0
+        }
+
+    def __getattr__(self, name: str):
+        return getattr(self.cache, name)
+
+    async def load_encoder(self):
+        """
+        在工作线程中加载句向量模型（首次使用可能需要下载），不阻塞事件循环；
+        引擎初始化时调用，查询时若尚未加载也会在这里等待
+        """
+        if not self.enabled:
+            return None
+
+        async with self._encoder_lock:
+            if self._encoder is None and not self._encoder_failed:
+                await asyncio.to_thread(self._get_encoder)
+        return self._encoder
+
+    def _get_encoder(self):
+        """加载句向量模型，加载失败后不再重试"""
+        if self._encoder is None and not self._encoder_failed:
+            try:
+                from sentence_transformers import SentenceTransformer
+                self._encoder = SentenceTransformer(self.model_name)
+                logger.info(f"语义缓存编码器已加载: {self.model_name}")
+            except Exception as e:
+                self._encoder_failed = True
+                logger.warning(f"语义缓存不可用，仅使用精确缓存: {e}")
+        return self._encoder
+
+    def _context_key(self, messages: List[Dict[str, str]]) -> str:
+        """
+        模型、系统提示词和上一条助手回复都相同的请求才互相复用回复。
+        "继续"、"为什么？"这类简短追问的含义取决于上一轮对话，不能跨对话复用
+        """
+        system = [m.get("content", "") for m in messages if m.get("role") == "system"]
+        previous = next(
+            (m.get("content", "") for m in reversed(messages[:-1]) if m.get("role") == "assistant"),
+            None
+        )
+        payload = {
+            "model": self.cache.client.config.text_model,
+            "system": system,
+            "previous": previous,
+        }
+        encoded = json.dumps(payload, sort_keys=True, ensure_ascii=False).encode("utf-8")
+        return hashlib.sha256(encoded).hexdigest()
+
+    def _lookup(self, key: str, embedding: np.ndarray) -> Optional[str]:
+        """返回相似度超过阈值的已缓存回复"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+
+        vectors, responses = entry
+        # 向量均已归一化，内积即余弦相似度
+        scores = vectors[:len(responses)] @ embedding
+        best = int(np.argmax(scores))
+        if scores[best] < self.threshold:
+            return None
+        return responses[best]
+
+    def _store(self, key: str, embedding: np.ndarray, response: str):
+        """写入一条缓存，条目满时覆盖最早写入的一条"""
+        entry = self._entries.get(key)
+        if entry is None:
+            vectors = np.empty((self.max_entries, embedding.shape[0]), dtype=np.float32)
+            entry = (vectors, [])
+            self._entries[key] = entry
+            self._write_index[key] = 0
+
+            # 系统提示词组数超过上限时丢弃最久未写入的一组
+            while len(self._entries) > self.max_contexts:
+                old_key, _ = self._entries.popitem(last=False)
+                del self._write_index[old_key]
+        else:
+            self._entries.move_to_end(key)
+
+        vectors, responses = entry
+        index = self._write_index[key]
+        vectors[index] = embedding
+        if index < len(responses):
+            responses[index] = response
+        else:
+            responses.append(response)
+        self._write_index[key] = (index + 1) % self.max_entries
+
+    async def chat_completion(self,
+                            messages: List[Dict[str, str]],
+                            max_tokens: int = 1000,
+                            temperature: float = 0.7,
+                            **kwargs) -> str:
+        """
+        发送聊天完成请求，最后一条用户消息与缓存的问题语义相近时直接返回缓存的回复
+
+        Args:
+            messages: 对话消息列表
+            max_tokens: 最大令牌数
+            temperature: 温度参数
+            **kwargs: 其他参数
+
+        Returns:
+            模型回复的文本
+        """
+        lookup = await self._semantic_lookup(messages, kwargs)
+        if lookup is None:
+            return await self.cache.chat_completion(messages, max_tokens, temperature, **kwargs)
+
+        key, embedding, cached = lookup
+        if cached is not None:
+            return cached
+
+        response = await self.cache.chat_completion(messages, max_tokens, temperature, **kwargs)
+
+        if response:
+            self._store(key, embedding, response)
+
+        return response
+
+    async def stream_chat_completion(self,
+                                   messages: List[Dict[str, str]],
+                                   max_tokens: int = 1000,
+                                   temperature: float = 0.7,
+                                   **kwargs) -> AsyncIterator[str]:
+        """
+        流式聊天完成请求，命中语义缓存时一次产出完整回复
+
+        Args:
+            messages: 对话消息列表
+            max_tokens: 最大令牌数
+            temperature: 温度参数
+            **kwargs: 其他参数
+
+        Yields:
+            回复文本的增量片段
+        """
+        lookup = await self._semantic_lookup(messages, kwargs)
+        if lookup is None:
+            async for delta in self.cache.stream_chat_completion(messages, max_tokens, temperature, **kwargs):
+                yield delta
+            return
+
+        key, embedding, cached = lookup
+        if cached is not None:
+            yield cached
+            return
+
+        parts = []
+        errors_before = self.cache.client.stats["errors"]
+        async for delta in self.cache.stream_chat_completion(messages, max_tokens, temperature, **kwargs):
+            parts.append(delta)
+            yield delta
+
+        # 流中途失败时只收到部分回复，不缓存
+        response = "".join(parts)
+        if response and self.cache.client.stats["errors"] == errors_before:
+            self._store(key, embedding, response)
+
+    async def _semantic_lookup(self, messages: List[Dict[str, str]],
+                               kwargs: Dict[str, Any]) -> Optional[Tuple[str, np.ndarray, Optional[str]]]:
+        """
+        查找语义相近的缓存回复
+
+        Returns:
+            不适用语义缓存时返回 None，否则返回 (分组键, 问题向量, 命中的回复或 None)
+        """
+        encoder = self._encoder
+        if encoder is None:
+            encoder = await self.load_encoder()
+        # 工具调用的结果依赖外部状态，不做语义复用
+        if encoder is None or kwargs.get("tools") or not messages or messages[-1].get("role") != "user":
+            return None
+
+        key = self._context_key(messages)
+        text = messages[-1].get("content", "")
+        embedding = await asyncio.to_thread(
+            encoder.encode, text, normalize_embeddings=True, convert_to_numpy=True
+        )
+        embedding = embedding.astype(np.float32, copy=False)
+
+        cached = self._lookup(key, embedding)
+        if cached is not None:
+            self.semantic_stats["hits"] += 1
+        else:
+            self.semantic_stats["misses"] += 1
+
+        return key, embedding, cached
+
+    def save(self, path: Union[str, Path]) -> bool:
+        """
+        将语义缓存保存为 .npz 文件，重启后可继续命中
+
+        Args:
+            path: 缓存文件路径
+
+        Returns:
+            是否保存成功
+        """
+        try:
+            arrays = {}
+            for key, (vectors, responses) in self._entries.items():
+                arrays[f"vectors_{key}"] = vectors[:len(responses)]
+                arrays[f"responses_{key}"] = np.array(responses, dtype=str)
+                arrays[f"index_{key}"] = np.array(self._write_index[key])
+
+            path = Path(path)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            with open(path, "wb") as f:
+                np.savez(f, **arrays)
+
+            logger.info(f"语义缓存已保存: {path}（{len(arrays) // 3} 组）")
+            return True
+
+        except Exception as e:
+            logger.error(f"保存语义缓存失败: {e}")
+            return False
+
+    def load(self, path: Union[str, Path]) -> bool:
+        """
+        从 .npz 文件加载语义缓存，超出当前容量的条目被丢弃
+
+        Args:
+            path: 缓存文件路径
+
+        Returns:
+            是否加载成功
+        """
+        try:
+            path = Path(path)
+            if not path.exists():
+                return False
+
+            with np.load(path, allow_pickle=False) as data:
+                for name in data.files:
+                    if not name.startswith("vectors_"):
+                        continue
+
+                    key = name[len("vectors_"):]
+                    stored = data[name]
+                    responses = data[f"responses_{key}"].tolist()[:self.max_entries]
+                    count = len(responses)
+
+                    vectors = np.empty((self.max_entries, stored.shape[1]), dtype=np.float32)
+                    vectors[:count] = stored[:count]
+                    self._entries[key] = (vectors, responses)
+                    self._write_index[key] = int(data[f"index_{key}"]) % self.max_entries \
+                        if count == self.max_entries else count
+
+            while len(self._entries) > self.max_contexts:
+                old_key, _ = self._entries.popitem(last=False)
+                del self._write_index[old_key]
+
+            logger.info(f"语义缓存已加载: {path}")
+            return True
+
+        except Exception as e:
+            logger.error(f"加载语义缓存失败: {e}")
+            return False
+
+    async def clear_cache(self):
+        """清空语义缓存和精确缓存"""
+        self._entries.clear()
+        self._write_index.clear()
+        self.semantic_stats = {
+            "hits": 0,
+            "misses": 0
+        }
+        await self.cache.clear_cache()
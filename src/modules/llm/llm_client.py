@@ -5,7 +5,10 @@
 
 import asyncio
 import json
-from typing import List, Dict, Any, Optional, Union
+import uuid
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Union, AsyncIterator
+from urllib.parse import urlparse
 from loguru import logger
 import httpx
 import time
@@ -13,6 +16,11 @@ import time
 from ...utils.config import LLMConfig
 
 
+# 只有 OpenAI 官方 API 接受 prompt_cache_key；兼容接口的服务（vLLM、LM Studio、Azure 等）
+# 可能因未知字段返回 400
+OPENAI_API_HOST = "api.openai.com"
+
+
 class LLMClient:
     """大语言模型客户端"""
     
@@ -21,6 +29,10 @@ class LLMClient:
         self._client: Optional[httpx.AsyncClient] = None
         self._initialized = False
         
+        # 会话 ID：作为服务端前缀缓存的路由键，同一会话的多轮请求复用已计算的 KV cache
+        self.session_id = uuid.uuid4().hex
+        self._send_cache_key = urlparse(config.text_endpoint).hostname == OPENAI_API_HOST
+        
         # 请求统计
         self.stats = {
             "total_requests": 0,
@@ -127,6 +139,9 @@ class LLMClient:
                 "temperature": temperature,
                 "stream": False
             }
+            if self._send_cache_key:
+                # 相同前缀的请求路由到同一缓存，避免每轮重新 prefill 历史对话
+                payload["prompt_cache_key"] = self.session_id
             payload.update(kwargs)
             
             response = await self._client.post(
@@ -161,26 +176,7 @@ class LLMClient:
                 "anthropic-version": "2023-06-01"
             }
             
-            # 转换消息格式
-            anthropic_messages = []
-            system_message = ""
-            
-            for msg in messages:
-                if msg["role"] == "system":
-                    system_message = msg["content"]
-                else:
-                    anthropic_messages.append(msg)
-            
-            payload = {
-                "model": self.config.text_model,
-                "max_tokens": max_tokens,
-                "temperature": temperature,
-                "messages": anthropic_messages
-            }
-            
-            if system_message:
-                payload["system"] = system_message
-                
+            payload = self._anthropic_payload(messages, max_tokens, temperature)
             payload.update(kwargs)
             
             if self._client:
@@ -208,6 +204,35 @@ class LLMClient:
             logger.error(f"Anthropic API请求失败: {e}")
             return ""
 
+    def _anthropic_payload(self, messages: List[Dict[str, str]],
+                           max_tokens: int, temperature: float) -> Dict[str, Any]:
+        """构建 Anthropic 请求体，系统消息转换为 system 字段"""
+        # 转换消息格式
+        anthropic_messages = []
+        system_blocks = []
+        
+        for msg in messages:
+            if msg["role"] == "system":
+                system_blocks.append({"type": "text", "text": msg["content"]})
+            else:
+                anthropic_messages.append(msg)
+        
+        # 第一条系统消息是静态角色设定，标记为可缓存前缀
+        if system_blocks:
+            system_blocks[0]["cache_control"] = {"type": "ephemeral"}
+        
+        payload = {
+            "model": self.config.text_model,
+            "max_tokens": max_tokens,
+            "temperature": temperature,
+            "messages": anthropic_messages
+        }
+        
+        if system_blocks:
+            payload["system"] = system_blocks
+            
+        return payload
+
     async def _local_request(self, messages: List[Dict[str, str]], 
                            max_tokens: int, temperature: float, **kwargs) -> str:
         """本地模型API请求（如Ollama）"""
@@ -225,7 +250,9 @@ class LLMClient:
                 "messages": messages,
                 "max_tokens": max_tokens,
                 "temperature": temperature,
-                "stream": False
+                "stream": False,
+                # llama.cpp server 保留上一轮的 KV cache，只对新增的 token 做 prefill
+                "cache_prompt": True
             }
             payload.update(kwargs)
             
@@ -251,6 +278,100 @@ class LLMClient:
             logger.error(f"本地API请求失败: {e}")
             return ""
 
+    async def stream_chat_completion(self,
+                                   messages: List[Dict[str, str]],
+                                   max_tokens: int = 1000,
+                                   temperature: float = 0.7,
+                                   **kwargs) -> AsyncIterator[str]:
+        """
+        流式聊天完成请求，模型生成的文本到达即产出
+        
+        Args:
+            messages: 对话消息列表
+            max_tokens: 最大令牌数
+            temperature: 温度参数
+            **kwargs: 其他参数
+            
+        Yields:
+            回复文本的增量片段，请求失败时提前结束
+        """
+        if not self._initialized or not self._client:
+            logger.error("LLM客户端未初始化")
+            return
+        
+        provider = self.config.text_provider
+        headers = {"Content-Type": "application/json"}
+        
+        if provider == "anthropic":
+            headers["x-api-key"] = self.config.text_api_key
+            headers["anthropic-version"] = "2023-06-01"
+            url = f"{self.config.text_endpoint}/messages"
+            payload = self._anthropic_payload(messages, max_tokens, temperature)
+        elif provider in ("openai", "local", "ollama"):
+            if self.config.text_api_key:
+                headers["Authorization"] = f"Bearer {self.config.text_api_key}"
+            url = f"{self.config.text_endpoint}/chat/completions"
+            payload = {
+                "model": self.config.text_model,
+                "messages": messages,
+                "max_tokens": max_tokens,
+                "temperature": temperature
+            }
+            if provider == "openai":
+                if self._send_cache_key:
+                    payload["prompt_cache_key"] = self.session_id
+            else:
+                payload["cache_prompt"] = True
+        else:
+            logger.error(f"不支持的LLM提供商: {provider}")
+            return
+        
+        payload.update(kwargs)
+        payload["stream"] = True
+        
+        start_time = time.time()
+        response_length = 0
+        
+        try:
+            async with self._client.stream("POST", url, headers=headers, json=payload) as response:
+                response.raise_for_status()
+                
+                # 服务端事件流：每个事件一行 "data: {...}"
+                async for line in response.aiter_lines():
+                    if not line.startswith("data:"):
+                        continue
+                    
+                    data = line[5:].strip()
+                    if data == "[DONE]":
+                        break
+                    
+                    delta = self._stream_delta(provider, json.loads(data))
+                    if delta:
+                        response_length += len(delta)
+                        yield delta
+            
+            self._update_stats(time.time() - start_time, response_length)
+            
+        except httpx.HTTPStatusError as e:
+            logger.error(f"LLM流式请求HTTP错误: {e.response.status_code}")
+            self.stats["errors"] += 1
+        except Exception as e:
+            logger.error(f"LLM流式请求失败: {e}")
+            self.stats["errors"] += 1
+
+    @staticmethod
+    def _stream_delta(provider: str, event: Dict[str, Any]) -> str:
+        """从流式事件中取出新增的文本"""
+        if provider == "anthropic":
+            if event.get("type") == "content_block_delta":
+                return event.get("delta", {}).get("text", "")
+            return ""
+        
+        choices = event.get("choices")
+        if choices:
+            return choices[0].get("delta", {}).get("content") or ""
+        return ""
+
     async def vision_completion(self, 
                               messages: List[Dict[str, Any]], 
                               image_data: Optional[bytes] = None,
@@ -414,6 +535,61 @@ class LLMClient:
         except Exception as e:
             logger.error(f"LLM客户端清理失败: {e}")
 
+    def save_session(self, path: Union[str, Path]) -> bool:
+        """
+        保存会话信息，重启后继续命中服务端的前缀缓存
+        
+        Args:
+            path: 会话文件路径
+            
+        Returns:
+            是否保存成功
+        """
+        try:
+            path = Path(path)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            session = {
+                "session_id": self.session_id,
+                "provider": self.config.text_provider,
+                "model": self.config.text_model
+            }
+            path.write_text(json.dumps(session, ensure_ascii=False), encoding="utf-8")
+            logger.info(f"LLM会话已保存: {path}")
+            return True
+            
+        except Exception as e:
+            logger.error(f"保存LLM会话失败: {e}")
+            return False
+
+    def load_session(self, path: Union[str, Path]) -> bool:
+        """
+        加载会话信息，提供商或模型不一致时忽略（缓存无法复用）
+        
+        Args:
+            path: 会话文件路径
+            
+        Returns:
+            是否加载成功
+        """
+        try:
+            path = Path(path)
+            if not path.exists():
+                return False
+                
+            session = json.loads(path.read_text(encoding="utf-8"))
+            if (session.get("provider") != self.config.text_provider
+                    or session.get("model") != self.config.text_model):
+                logger.info("LLM会话的模型已变更，使用新会话")
+                return False
+                
+            self.session_id = session["session_id"]
+            logger.info(f"LLM会话已加载: {path}")
+            return True
+            
+        except Exception as e:
+            logger.error(f"加载LLM会话失败: {e}")
+            return False
+
     # 配置更新方法
     def update_config(self, **kwargs):
         """动态更新配置"""
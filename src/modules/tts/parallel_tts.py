@@ -0,0 +1,68 @@
+"""
+并行语音合成 - 限制并发数同时合成多句回复，并按提交顺序交付结果
+"""
+
+import asyncio
+from typing import Any, Coroutine, Dict, Optional
+
+
+class ParallelTTS:
+    """
+    有界并发的合成调度器
+    
+    submit(index, coro) 提交第 index 句的合成协程，最多 concurrency 个同时运行；
+    next() 严格按 index 顺序返回结果，第 N 句播放时后续句子已在合成
+    """
+    
+    def __init__(self, concurrency: int = 3):
+        self.concurrency = concurrency
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._tasks: Dict[int, asyncio.Task] = {}
+        self._next_emit = 0
+        self._closed = False
+        self._submitted = asyncio.Event()
+    
+    def submit(self, index: int, coro: Coroutine[Any, Any, Any]):
+        """提交一句的合成协程"""
+        self._tasks[index] = asyncio.create_task(self._run(coro))
+        self._submitted.set()
+    
+    async def _run(self, coro: Coroutine[Any, Any, Any]) -> Any:
+        try:
+            async with self._semaphore:
+                return await coro
+        finally:
+            # 排队期间被取消时关闭协程，避免“从未 await”警告
+            coro.close()
+    
+    def close(self):
+        """不再提交新的句子，已提交的结果全部交付后 next() 返回 None"""
+        self._closed = True
+        self._submitted.set()
+    
+    async def next(self) -> Optional[Any]:
+        """按提交顺序等待下一句的结果，合成失败时抛出对应异常"""
+        while self._next_emit not in self._tasks:
+            if self._closed:
+                return None
+            self._submitted.clear()
+            await self._submitted.wait()
+        
+        task = self._tasks.pop(self._next_emit)
+        self._next_emit += 1
+        return await task
+    
+    def cancel(self):
+        """取消所有未交付的合成任务"""
+        for task in self._tasks.values():
+            task.cancel()
+        self._tasks.clear()
+        self._closed = True
+        self._submitted.set()
+    
+    def reset(self):
+        """取消上一轮的残留任务并从序号 0 重新开始"""
+        self.cancel()
+        self._next_emit = 0
+        self._closed = False
+        self._submitted.clear()
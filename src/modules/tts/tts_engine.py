@@ -3,7 +3,9 @@ TTS 引擎模块 - 支持语音合成、音素时序生成和音频播放
 """
 
 import asyncio
+import hashlib
 import logging
+import os
 import numpy as np
 import torch
 import time
@@ -13,6 +15,7 @@ from typing import Optional, List, Dict, Any, Callable, Tuple
 from dataclasses import dataclass
 from pathlib import Path
 import threading
+from collections import OrderedDict
 
 try:
     import onnxruntime as ort
@@ -38,6 +41,16 @@ class AudioSegment:
     phoneme_timing: List[Tuple[float, str]] = None
 
 
+# 音素时序缓存的最大条目数（按最近使用淘汰）
+PHONEME_CACHE_SIZE = 512
+
+# 播放时每次写入输出流的音频时长（秒），也是中断播放的最大延迟
+PLAYBACK_CHUNK_SECONDS = 0.08
+
+# 磁盘音频缓存格式版本，合成流程的输出发生变化时递增以使旧缓存失效
+TTS_CACHE_VERSION = 1
+
+
 @dataclass
 class PhonemeTimestamp:
     """音素时间戳"""
@@ -68,16 +81,24 @@ class TTSEngine:
     6. 音频播放和流处理
     """
     
-    def __init__(self, voice: str = "default", speed: float = 1.0, device: str = "auto"):
+    def __init__(self, voice: str = "default", speed: float = 1.0, device: str = "auto",
+                 cache_dir: Optional[str] = "resources/cache/tts", cache_max_mb: float = 256.0):
         self.voice = voice
         self.speed = speed
         self.device = self._get_device(device)
         
+        # 合成结果的磁盘缓存，重复的回复直接读取音频；cache_dir 为 None 时不缓存
+        self.cache_dir = Path(cache_dir) if cache_dir else None
+        self.cache_max_bytes = int(cache_max_mb * 1024 * 1024)
+        
         self.logger = logging.getLogger(__name__)
         
         # 模型相关
         self.synthesis_session: Optional[ort.InferenceSession] = None
         self.voice_embeddings: Dict[str, np.ndarray] = {}
+        
+        # 音素时序缓存：(文本, 语音, 语速) -> 时序列表，重复的回复跳过音素化
+        self._phoneme_cache: "OrderedDict[Tuple[str, str, float], List[PhonemeTimestamp]]" = OrderedDict()
         self.phoneme_to_id: Dict[str, int] = {}
         self.id_to_phoneme: Dict[int, str] = {}
         
@@ -91,6 +112,10 @@ class TTSEngine:
         self.playback_queue: asyncio.Queue = asyncio.Queue()
         self.is_playing = False
         self.stop_playback_flag = threading.Event()
+        self._pyaudio: Optional[Any] = None
+        self._output_stream: Optional[Any] = None
+        # 正在向输出流写入的线程；取消播放任务不会停止它，停止播放和清理时需等待其退出
+        self._writer: Optional[asyncio.Future] = None
         
         # 配置
         self.config = {
@@ -418,27 +443,38 @@ class TTSEngine:
             if self.on_synthesis_start:
                 self.on_synthesis_start(text)
             
-            # 文本预处理
-            cleaned_text = self._preprocess_text(text)
-            
-            # 音素化
-            phonemes = await self._text_to_phonemes(cleaned_text)
-            
             # 选择语音
             voice_name = voice or self.voice
+            use_onnx = bool(self.synthesis_session) and voice_name in self.voice_embeddings
             
-            # 合成音频
-            if self.synthesis_session and voice_name in self.voice_embeddings:
-                audio_data = await self._synthesize_with_onnx(phonemes, voice_name)
-            else:
-                audio_data = await self._synthesize_with_espeak(cleaned_text)
-            
-            if audio_data is None or len(audio_data) == 0:
-                return None
+            # 优先读取磁盘缓存
+            cache_key = self._audio_cache_key(text, voice_name, use_onnx)
+            cached = await asyncio.to_thread(self._load_cached_audio, cache_key) if self.cache_dir else None
             
-            # 应用速度调整
-            if self.speed != 1.0:
-                audio_data = self._adjust_speed(audio_data, self.speed)
+            if cached is not None:
+                audio_data, phonemes = cached
+            else:
+                # 文本预处理
+                cleaned_text = self._preprocess_text(text)
+                
+                # 音素化
+                phonemes = await self._text_to_phonemes(cleaned_text)
+                
+                # 合成音频
+                if use_onnx:
+                    audio_data = await self._synthesize_with_onnx(phonemes, voice_name)
+                else:
+                    audio_data = await self._synthesize_with_espeak(cleaned_text)
+                
+                if audio_data is None or len(audio_data) == 0:
+                    return None
+                
+                # 应用速度调整
+                if self.speed != 1.0:
+                    audio_data = self._adjust_speed(audio_data, self.speed)
+                
+                if self.cache_dir:
+                    await asyncio.to_thread(self._store_cached_audio, cache_key, audio_data, phonemes)
             
             # 创建音频段
             duration = len(audio_data) / self.config["sample_rate"]
@@ -473,6 +509,56 @@ class TTSEngine:
             self.logger.error(f"语音合成失败: {e}")
             return None
     
+    def _audio_cache_key(self, text: str, voice_name: str, use_onnx: bool) -> str:
+        """根据文本、语音、语速和合成后端计算缓存键"""
+        backend = "onnx" if use_onnx else "espeak"
+        raw = f"{TTS_CACHE_VERSION}|{backend}|{voice_name}|{self.speed}|{text}"
+        return hashlib.blake2b(raw.encode("utf-8"), digest_size=16).hexdigest()
+    
+    def _load_cached_audio(self, cache_key: str) -> Optional[Tuple[np.ndarray, str]]:
+        """读取缓存的音频和音素，未命中返回 None"""
+        path = self.cache_dir / f"{cache_key}.npz"
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                audio_data = data["audio"]
+                phonemes = str(data["phonemes"])
+            
+            # 更新修改时间，淘汰时按最近使用排序
+            os.utime(path)
+            return audio_data, phonemes
+            
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            self.logger.warning(f"读取 TTS 缓存失败: {e}")
+            return None
+    
+    def _store_cached_audio(self, cache_key: str, audio_data: np.ndarray, phonemes: str):
+        """写入缓存，总大小超过上限时删除最久未使用的文件"""
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            
+            # 先写临时文件再改名，避免读到写了一半的缓存
+            path = self.cache_dir / f"{cache_key}.npz"
+            tmp_path = path.with_suffix(".tmp")
+            with open(tmp_path, "wb") as f:
+                np.savez(f, audio=np.asarray(audio_data, dtype=np.float32), phonemes=np.array(phonemes))
+            os.replace(tmp_path, path)
+            
+            entries = [(entry.stat(), entry) for entry in self.cache_dir.glob("*.npz")]
+            total = sum(stat.st_size for stat, _ in entries)
+            if total <= self.cache_max_bytes:
+                return
+            
+            for stat, entry in sorted(entries, key=lambda item: item[0].st_mtime):
+                if total <= self.cache_max_bytes:
+                    break
+                entry.unlink(missing_ok=True)
+                total -= stat.st_size
+                
+        except Exception as e:
+            self.logger.warning(f"写入 TTS 缓存失败: {e}")
+    
     def _preprocess_text(self, text: str) -> str:
         """文本预处理"""
         try:
@@ -713,7 +799,24 @@ class TTSEngine:
             return audio_data
     
     async def get_phoneme_timing(self, text: str) -> List[PhonemeTimestamp]:
-        """获取音素时序（用于唇形同步）"""
+        """获取音素时序（用于唇形同步），返回的列表与缓存共享，调用方不应修改"""
+        cache_key = (text, self.voice, self.speed)
+        cached = self._phoneme_cache.get(cache_key)
+        if cached is not None:
+            self._phoneme_cache.move_to_end(cache_key)
+            return cached
+        
+        timestamps = await self._compute_phoneme_timing(text)
+        
+        if timestamps:
+            self._phoneme_cache[cache_key] = timestamps
+            if len(self._phoneme_cache) > PHONEME_CACHE_SIZE:
+                self._phoneme_cache.popitem(last=False)
+        
+        return timestamps
+    
+    async def _compute_phoneme_timing(self, text: str) -> List[PhonemeTimestamp]:
+        """音素化并估算每个音素的时序"""
         try:
             # 获取音素
             phonemes = await self._text_to_phonemes(text)
@@ -797,30 +900,36 @@ class TTSEngine:
             return False
     
     async def _play_with_pyaudio(self, audio_data: np.ndarray) -> bool:
-        """使用 pyaudio 播放音频"""
+        """使用 pyaudio 播放音频，按小块在线程中写入输出流，不阻塞事件循环"""
         try:
-            import pyaudio
-            
             # 转换为 16-bit PCM
             audio_int16 = (audio_data * 32767).astype(np.int16)
             
-            # 创建 pyaudio 实例
-            p = pyaudio.PyAudio()
-            
-            stream = p.open(
-                format=pyaudio.paInt16,
-                channels=1,
-                rate=self.config["sample_rate"],
-                output=True
-            )
+            # 输出流在首次播放时打开，之后各句复用
+            if self._output_stream is None:
+                import pyaudio
+                
+                self._pyaudio = pyaudio.PyAudio()
+                self._output_stream = self._pyaudio.open(
+                    format=pyaudio.paInt16,
+                    channels=1,
+                    rate=self.config["sample_rate"],
+                    output=True
+                )
             
-            # 播放音频
-            stream.write(audio_int16.tobytes())
+            # 上一句的播放任务被取消时写入线程可能仍在运行，先让它退出，
+            # 保证同一时间只有一个线程写入输出流
+            await self._wait_writer()
             
-            # 清理
-            stream.stop_stream()
-            stream.close()
-            p.terminate()
+            self.stop_playback_flag.clear()
+            self.is_playing = True
+            try:
+                loop = asyncio.get_running_loop()
+                self._writer = loop.run_in_executor(None, self._write_output_chunks, audio_int16)
+                # shield：取消本任务时不把 _writer 标记为已取消，它仍反映线程是否结束
+                await asyncio.shield(self._writer)
+            finally:
+                self.is_playing = False
             
             return True
             
@@ -828,10 +937,28 @@ class TTSEngine:
             self.logger.error(f"pyaudio 播放失败: {e}")
             return False
     
+    def _write_output_chunks(self, audio_int16: np.ndarray):
+        """逐块写入输出流，每块之间检查停止标志，中断时最多再播放一块"""
+        chunk_size = int(self.config["sample_rate"] * PLAYBACK_CHUNK_SECONDS)
+        for start in range(0, len(audio_int16), chunk_size):
+            if self.stop_playback_flag.is_set():
+                break
+            self._output_stream.write(audio_int16[start:start + chunk_size].tobytes())
+    
+    async def _wait_writer(self):
+        """通知写入线程停止并等待它退出（最多再写入一块）"""
+        writer = self._writer
+        if writer is not None and not writer.done():
+            self.stop_playback_flag.set()
+            # asyncio.wait 在调用方被取消时不会取消 writer
+            await asyncio.wait((writer,))
+        self._writer = None
+    
     async def stop_playback(self):
         """停止播放"""
         try:
             self.stop_playback_flag.set()
+            await self._wait_writer()
             
             if self.audio_player == "pygame":
                 pygame.mixer.music.stop()
@@ -890,6 +1017,15 @@ class TTSEngine:
             if self.audio_player == "pygame":
                 pygame.mixer.quit()
             
+            # 关闭 pyaudio 输出流（stop_playback 已等待写入线程退出）
+            if self._output_stream is not None:
+                self._output_stream.stop_stream()
+                self._output_stream.close()
+                self._output_stream = None
+            if self._pyaudio is not None:
+                self._pyaudio.terminate()
+                self._pyaudio = None
+            
             # 清理缓存
             self.voice_embeddings.clear()
             
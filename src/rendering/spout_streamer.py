@@ -56,6 +56,12 @@ class SpoutStreamer:
         # 帧队列和处理
         self.frame_queue = queue.Queue(maxsize=10)
         self.streaming = False
+        
+        # 帧缓冲池：渲染直接写入池中的缓冲区，推流后归还复用，避免每帧分配
+        # 上限 = 队列容量 + 正在渲染的一帧 + 正在发送的一帧
+        self._frame_pool: queue.Queue = queue.Queue()
+        self._frame_pool_ids: set = set()
+        self._frame_pool_limit = self.frame_queue.maxsize + 2
         self.stream_thread: Optional[threading.Thread] = None
         
         # 统计信息
@@ -260,6 +266,8 @@ class SpoutStreamer:
                     if self.connected:
                         self._send_to_obs(frame)
                     
+                    self.release_frame_buffer(frame)
+                    
                     self.frames_sent += 1
                     self._update_fps_stats()
                 
@@ -318,10 +326,65 @@ class SpoutStreamer:
             self.frames_sent = 0
             self.last_fps_check = current_time
     
+    def acquire_frame_buffer(self, height: int, width: int) -> np.ndarray:
+        """
+        获取一块可写入的 RGBA 帧缓冲区
+        
+        优先复用已归还的缓冲区；池已用尽时回收队列中最旧的帧。
+        
+        Args:
+            height: 帧高度
+            width: 帧宽度
+            
+        Returns:
+            形状为 (height, width, 4) 的 uint8 数组
+        """
+        shape = (height, width, 4)
+        
+        while True:
+            try:
+                buffer = self._frame_pool.get_nowait()
+            except queue.Empty:
+                break
+            if buffer.shape == shape:
+                return buffer
+            # 尺寸已变化，丢弃旧缓冲区
+            self._frame_pool_ids.discard(id(buffer))
+        
+        if len(self._frame_pool_ids) < self._frame_pool_limit:
+            buffer = np.empty(shape, dtype=np.uint8)
+            self._frame_pool_ids.add(id(buffer))
+            return buffer
+        
+        # 推流跟不上渲染：复用最旧的未发送帧
+        try:
+            stale = self.frame_queue.get_nowait()
+            buffer = self._pool_buffer_of(stale)
+            if buffer is not None and buffer.shape == shape:
+                return buffer
+        except queue.Empty:
+            pass
+        
+        return np.empty(shape, dtype=np.uint8)
+    
+    def release_frame_buffer(self, frame: np.ndarray):
+        """归还帧缓冲区（frame 可以是缓冲区本身或其视图），非池内数组忽略"""
+        buffer = self._pool_buffer_of(frame)
+        if buffer is not None:
+            self._frame_pool.put_nowait(buffer)
+    
+    def _pool_buffer_of(self, frame: np.ndarray) -> Optional[np.ndarray]:
+        """返回 frame 所属的池内缓冲区"""
+        buffer = frame if frame.base is None else frame.base
+        if isinstance(buffer, np.ndarray) and id(buffer) in self._frame_pool_ids:
+            return buffer
+        return None
+    
     def send_frame(self, frame: np.ndarray):
         """发送帧数据"""
         try:
             if not self.streaming:
+                self.release_frame_buffer(frame)
                 return
             
             # 添加到队列（如果队列满了，丢弃最旧的帧）
@@ -330,7 +393,7 @@ class SpoutStreamer:
             except queue.Full:
                 # 丢弃最旧的帧
                 try:
-                    self.frame_queue.get_nowait()
+                    self.release_frame_buffer(self.frame_queue.get_nowait())
                     self.frame_queue.put_nowait(frame)
                 except queue.Empty:
                     pass
@@ -468,7 +531,7 @@ class SpoutStreamer:
             # 清空队列
             while not self.frame_queue.empty():
                 try:
-                    self.frame_queue.get_nowait()
+                    self.release_frame_buffer(self.frame_queue.get_nowait())
                 except queue.Empty:
                     break
             
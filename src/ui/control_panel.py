@@ -9,7 +9,6 @@ from tkinter import ttk, messagebox, filedialog
 import customtkinter as ctk
 from typing import Optional, Callable, Dict, Any
 from loguru import logger
-import threading
 import time
 
 from ..core.avatar_engine import AvatarEngine, EngineState
@@ -19,10 +18,18 @@ from ..utils.config import Config
 class ControlPanel:
     """控制面板主类"""
     
-    def __init__(self, engine: AvatarEngine, config: Config):
+    def __init__(self, engine: AvatarEngine, config: Config,
+                 engine_loop: Optional[asyncio.AbstractEventLoop] = None,
+                 on_close: Optional[Callable[[], None]] = None):
         self.engine = engine
         self.config = config
         
+        # 引擎所在的事件循环（运行在后台线程），UI 线程只向其提交协程
+        self.engine_loop = engine_loop
+        
+        # 窗口关闭时通知应用程序（线程安全，事件驱动而非轮询）
+        self.on_close = on_close
+        
         # UI组件
         self.root: Optional[ctk.CTk] = None
         self.status_frame: Optional[ctk.CTkFrame] = None
@@ -55,7 +62,6 @@ class ControlPanel:
         self.speed_slider: Optional[ctk.CTkSlider] = None
         
         # 更新控制
-        self._update_task: Optional[asyncio.Task] = None
         self._running = False
         
         logger.info("控制面板初始化")
@@ -298,11 +304,38 @@ class ControlPanel:
         self.engine.on_text_recognized = self._on_text_recognized
         self.engine.on_response_generated = self._on_response_generated
 
+    def _submit_to_engine(self, coro, on_done: Optional[Callable[[Any], None]] = None):
+        """
+        将协程提交到引擎事件循环执行
+        
+        Args:
+            coro: 要执行的协程
+            on_done: 完成回调，会通过 root.after 回到 Tk 主线程执行
+        """
+        if self.engine_loop is None:
+            coro.close()
+            logger.error("引擎事件循环不可用")
+            return None
+        
+        future = asyncio.run_coroutine_threadsafe(coro, self.engine_loop)
+        
+        def _done(fut):
+            try:
+                result = fut.result()
+            except Exception as e:
+                logger.error(f"引擎任务执行失败: {e}")
+                return
+            if on_done and self.root:
+                self.root.after(0, lambda: on_done(result))
+        
+        future.add_done_callback(_done)
+        return future
+
     def _on_start_clicked(self):
         """启动按钮点击事件"""
         try:
-            # 在后台启动引擎
-            threading.Thread(target=self._start_engine_sync, daemon=True).start()
+            # 在引擎事件循环中启动引擎
+            self._submit_to_engine(self.engine.start())
             
             # 更新按钮状态
             self.start_button.configure(state="disabled")
@@ -312,20 +345,11 @@ class ControlPanel:
             logger.error(f"启动引擎失败: {e}")
             messagebox.showerror("错误", f"启动引擎失败: {e}")
 
-    def _start_engine_sync(self):
-        """同步启动引擎"""
-        try:
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
-            loop.run_until_complete(self.engine.start())
-        except Exception as e:
-            logger.error(f"引擎启动失败: {e}")
-
     def _on_stop_clicked(self):
         """停止按钮点击事件"""
         try:
-            # 在后台停止引擎
-            threading.Thread(target=self._stop_engine_sync, daemon=True).start()
+            # 在引擎事件循环中停止引擎
+            self._submit_to_engine(self.engine.stop())
             
             # 更新按钮状态
             self.start_button.configure(state="normal")
@@ -335,51 +359,34 @@ class ControlPanel:
             logger.error(f"停止引擎失败: {e}")
             messagebox.showerror("错误", f"停止引擎失败: {e}")
 
-    def _stop_engine_sync(self):
-        """同步停止引擎"""
-        try:
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
-            loop.run_until_complete(self.engine.stop())
-        except Exception as e:
-            logger.error(f"引擎停止失败: {e}")
-
     def _on_test_clicked(self):
         """测试按钮点击事件"""
         try:
             # 显示测试消息
             self._add_chat_message("系统", "正在进行功能测试...")
             
-            # 在后台执行测试
-            threading.Thread(target=self._run_tests_sync, daemon=True).start()
+            # 在引擎事件循环中执行测试
+            self._submit_to_engine(self._run_tests(), on_done=self._show_test_results)
             
         except Exception as e:
             logger.error(f"测试失败: {e}")
             messagebox.showerror("错误", f"测试失败: {e}")
 
-    def _run_tests_sync(self):
-        """同步运行测试"""
-        try:
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
-            
-            # 测试各个模块
-            test_results = {}
-            
-            if self.engine.asr:
-                test_results["ASR"] = loop.run_until_complete(self._test_asr())
-            if self.engine.tts:
-                test_results["TTS"] = loop.run_until_complete(self._test_tts())
-            if self.engine.llm:
-                test_results["LLM"] = loop.run_until_complete(self._test_llm())
-            if self.engine.audio:
-                test_results["Audio"] = loop.run_until_complete(self._test_audio())
-            
-            # 显示测试结果
-            self.root.after(0, lambda: self._show_test_results(test_results))
-            
-        except Exception as e:
-            logger.error(f"测试执行失败: {e}")
+    async def _run_tests(self) -> Dict[str, bool]:
+        """运行测试"""
+        # 测试各个模块
+        test_results = {}
+        
+        if self.engine.asr:
+            test_results["ASR"] = await self._test_asr()
+        if self.engine.tts:
+            test_results["TTS"] = await self._test_tts()
+        if self.engine.llm:
+            test_results["LLM"] = await self._test_llm()
+        if self.engine.audio:
+            test_results["Audio"] = await self._test_audio()
+        
+        return test_results
 
     async def _test_asr(self) -> bool:
         """测试ASR模块"""
@@ -432,25 +439,19 @@ class ControlPanel:
             # 显示用户消息
             self._add_chat_message("用户", message)
             
-            # 在后台发送消息
-            threading.Thread(target=self._send_message_sync, args=(message,), daemon=True).start()
+            # 在引擎事件循环中发送消息，回复在主线程中显示
+            self._submit_to_engine(
+                self.engine.send_text_message(message),
+                on_done=self._show_reply
+            )
             
         except Exception as e:
             logger.error(f"发送消息失败: {e}")
 
-    def _send_message_sync(self, message: str):
-        """同步发送消息"""
-        try:
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
-            response = loop.run_until_complete(self.engine.send_text_message(message))
-            
-            if response:
-                # 在主线程中显示回复
-                self.root.after(0, lambda: self._add_chat_message("Aria", response))
-            
-        except Exception as e:
-            logger.error(f"发送消息失败: {e}")
+    def _show_reply(self, response: str):
+        """显示回复消息（在主线程中调用）"""
+        if response:
+            self._add_chat_message("Aria", response)
 
     def _on_volume_changed(self, value: float):
         """音量滑块变化事件"""
@@ -545,7 +546,10 @@ class ControlPanel:
             
             # 停止引擎
             if self.engine.get_state() != EngineState.STOPPED:
-                threading.Thread(target=self._stop_engine_sync, daemon=True).start()
+                self._submit_to_engine(self.engine.stop())
+            
+            if self.on_close:
+                self.on_close()
             
             # 关闭窗口
             self.root.quit()
@@ -9,6 +9,12 @@ from dataclasses import dataclass, field
 from pathlib import Path
 from loguru import logger
 
+# 优先使用 libyaml 的 C 解析器
+try:
+    from yaml import CSafeLoader as YamlLoader
+except ImportError:
+    from yaml import SafeLoader as YamlLoader
+
 
 @dataclass
 class WindowConfig:
@@ -196,7 +202,7 @@ class Config:
         
         try:
             with open(config_file, 'r', encoding='utf-8') as f:
-                config_dict = yaml.safe_load(f)
+                config_dict = yaml.load(f, Loader=YamlLoader)
             
             if not config_dict:
                 logger.warning("配置文件为空，使用默认配置")
@@ -6,17 +6,65 @@
 
 import asyncio
 import sys
+import tempfile
 import time
 from pathlib import Path
 
+import numpy as np
+import torch
+
 # 添加项目根目录到 Python 路径
 sys.path.append(str(Path(__file__).parent))
 
 from src.core.avatar_engine import AvatarEngine, EngineConfig
+from src.core.conversation_manager import ConversationManager
+from src.modules.asr.whisper_asr import WhisperASR
 from src.modules.live2d.hiyori_config import HiyoriConfig
+from src.modules.llm.llm_cache import LLMCache, MemoryCacheBackend, SemanticLLMCache
+from src.utils.config import LLMConfig
 from loguru import logger
 
 
+class FakeLLMClient:
+    """按调用次数生成回复的 LLM 客户端替身，fail_stream 为 True 时流式回复中途出错"""
+    
+    def __init__(self):
+        self.config = LLMConfig(text_model="fake-model")
+        self.stats = {"errors": 0}
+        self.calls = 0
+        self.fail_stream = False
+    
+    async def chat_completion(self, messages, max_tokens=1000, temperature=0.7, **kwargs):
+        self.calls += 1
+        return f"回复{self.calls}"
+    
+    async def stream_chat_completion(self, messages, max_tokens=1000, temperature=0.7, **kwargs):
+        self.calls += 1
+        yield f"回复{self.calls}-"
+        if self.fail_stream:
+            # 与真实客户端一致：出错时记录错误并结束流，不抛出异常
+            self.stats["errors"] += 1
+            return
+        yield "完"
+
+
+class FakeEncoder:
+    """句向量模型替身：相同文本得到相同的单位向量，不同文本的向量正交"""
+    
+    def __init__(self, dim: int = 8):
+        self.dim = dim
+        self._index = {}
+    
+    def encode(self, text, normalize_embeddings=True, convert_to_numpy=True):
+        vector = np.zeros(self.dim, dtype=np.float32)
+        vector[self._index.setdefault(text, len(self._index) % self.dim)] = 1.0
+        return vector
+
+
+def _user(text: str):
+    return [{"role": "system", "content": "角色设定"}, {"role": "user", "content": text}]
+
+
 class IntegrationTester:
     """集成测试器"""
     
@@ -52,6 +100,22 @@ class IntegrationTester:
         if not await self.test_hiyori_config():
             return False
         
+        # 测试流式回复切分
+        if not await self.test_stream_chunking():
+            return False
+        
+        # 测试 LLM 响应缓存
+        if not await self.test_llm_cache():
+            return False
+        
+        # 测试语义缓存
+        if not await self.test_semantic_cache():
+            return False
+        
+        # 测试 torch.compile 失败时的 ASR 回退
+        if not await self.test_asr_compile_fallback():
+            return False
+        
         # 测试完整流程
         if not await self.test_complete_workflow():
             return False
@@ -213,6 +277,199 @@ class IntegrationTester:
             logger.error(f"❌ Hiyori 配置测试失败: {e}")
             return False
     
+    async def test_stream_chunking(self):
+        """测试流式回复切分不会切开未闭合的情感标签"""
+        try:
+            logger.info("✂️ 测试流式回复切分...")
+            
+            # 缓冲区超过分句长度后，流式到一半的 "[EMOTION:" 中的冒号不能被当作分句符
+            deltas = ["这是一段足够长的开场白，用来让缓冲区超过分句长度的阈值呀呀呀呀呀呀很好",
+                      "[EMOTION:", "happy]", "好的。"]
+            buffer = ""
+            chunks = []
+            for delta in deltas:
+                buffer += delta
+                cut = ConversationManager._find_chunk_end(buffer)
+                if cut:
+                    chunks.append(buffer[:cut])
+                    buffer = buffer[cut:]
+            
+            if buffer or not any("[EMOTION:happy]" in chunk for chunk in chunks):
+                logger.error(f"❌ 情感标签被切开: {chunks} + {buffer!r}")
+                return False
+            
+            logger.info("✅ 流式回复切分测试通过")
+            return True
+            
+        except Exception as e:
+            logger.error(f"❌ 流式回复切分测试失败: {e}")
+            return False
+    
+    async def test_llm_cache(self):
+        """测试精确响应缓存：键的稳定性、随机采样绕过、TTL、LRU 淘汰和不完整流不缓存"""
+        try:
+            logger.info("🗄️ 测试 LLM 响应缓存...")
+            
+            client = FakeLLMClient()
+            cache = LLMCache(client)
+            
+            # 键只取决于请求内容，与字典的键顺序无关
+            key = cache._make_key(_user("你好"), 100, [{"b": 1, "a": 2}])
+            reordered = [{"content": "角色设定", "role": "system"}, {"content": "你好", "role": "user"}]
+            if key != cache._make_key(reordered, 100, [{"a": 2, "b": 1}]) \
+                    or key == cache._make_key(_user("你好"), 200, [{"b": 1, "a": 2}]):
+                logger.error("❌ 缓存键不稳定或未区分请求参数")
+                return False
+            
+            # temperature > 0 的请求每次都发给模型
+            await cache.chat_completion(_user("你好"), temperature=0.7)
+            await cache.chat_completion(_user("你好"), temperature=0.7)
+            if client.calls != 2 or cache.cache_stats["hits"] or cache.cache_stats["misses"]:
+                logger.error("❌ 随机采样的请求不应经过缓存")
+                return False
+            
+            # temperature = 0 的重复请求命中缓存
+            first = await cache.chat_completion(_user("你好"), temperature=0)
+            second = await cache.chat_completion(_user("你好"), temperature=0)
+            if first != second or client.calls != 3 or cache.cache_stats["hits"] != 1:
+                logger.error("❌ 确定性请求未命中缓存")
+                return False
+            
+            # 过期条目不再返回
+            backend = MemoryCacheBackend(max_entries=2)
+            await backend.set("expired", "旧回复", ttl_seconds=-1.0)
+            if await backend.get("expired") is not None:
+                logger.error("❌ 过期条目仍被返回")
+                return False
+            
+            # 超出容量时淘汰最久未使用的条目
+            await backend.set("a", "A", 60.0)
+            await backend.set("b", "B", 60.0)
+            await backend.get("a")
+            await backend.set("c", "C", 60.0)
+            if await backend.get("b") is not None or await backend.get("a") != "A":
+                logger.error("❌ LRU 淘汰顺序错误")
+                return False
+            
+            # 中途出错的流式回复不缓存，完整的流式回复缓存后一次产出
+            client.fail_stream = True
+            partial = [delta async for delta in cache.stream_chat_completion(_user("讲个故事"), temperature=0)]
+            client.fail_stream = False
+            complete = [delta async for delta in cache.stream_chat_completion(_user("讲个故事"), temperature=0)]
+            cached = [delta async for delta in cache.stream_chat_completion(_user("讲个故事"), temperature=0)]
+            if len(partial) != 1 or cached != ["".join(complete)] or client.calls != 5:
+                logger.error(f"❌ 流式缓存错误: {partial} / {complete} / {cached}")
+                return False
+            
+            logger.info("✅ LLM 响应缓存测试通过")
+            return True
+            
+        except Exception as e:
+            logger.error(f"❌ LLM 响应缓存测试失败: {e}")
+            return False
+    
+    async def test_semantic_cache(self):
+        """测试语义缓存：上下文分组、条目循环覆盖和 npz 保存/加载"""
+        try:
+            logger.info("🧭 测试语义缓存...")
+            
+            client = FakeLLMClient()
+            semantic = SemanticLLMCache(LLMCache(client), max_entries=2)
+            semantic._encoder = FakeEncoder()
+            
+            # 相同问题命中，不再请求模型
+            reply = await semantic.chat_completion(_user("你好"))
+            if await semantic.chat_completion(_user("你好")) != reply or client.calls != 1:
+                logger.error("❌ 相同问题未命中语义缓存")
+                return False
+            
+            # 上一条助手回复不同时属于不同上下文，简短追问不跨对话复用
+            follow_a = [*_user("讲讲猫")[:1], {"role": "assistant", "content": "猫很可爱"},
+                        {"role": "user", "content": "继续"}]
+            follow_b = [*_user("讲讲狗")[:1], {"role": "assistant", "content": "狗很忠诚"},
+                        {"role": "user", "content": "继续"}]
+            reply_a = await semantic.chat_completion(follow_a)
+            if await semantic.chat_completion(follow_b) == reply_a:
+                logger.error("❌ 追问复用了其他对话的回复")
+                return False
+            
+            # 条目满时覆盖最早写入的一条
+            await semantic.chat_completion(_user("问题二"))
+            await semantic.chat_completion(_user("问题三"))
+            calls = client.calls
+            await semantic.chat_completion(_user("你好"))
+            if client.calls != calls + 1:
+                logger.error("❌ 最早的条目未被覆盖")
+                return False
+            
+            # 保存后加载到新实例，条目和写入位置保持不变
+            with tempfile.TemporaryDirectory() as tmp:
+                path = Path(tmp) / "semantic_cache.npz"
+                if not semantic.save(path):
+                    logger.error("❌ 语义缓存保存失败")
+                    return False
+                
+                restored = SemanticLLMCache(LLMCache(FakeLLMClient()), max_entries=2)
+                if not restored.load(path):
+                    logger.error("❌ 语义缓存加载失败")
+                    return False
+            
+            if restored._entries.keys() != semantic._entries.keys() or restored._write_index != semantic._write_index:
+                logger.error("❌ 加载后的分组或写入位置不一致")
+                return False
+            for key, (vectors, responses) in semantic._entries.items():
+                restored_vectors, restored_responses = restored._entries[key]
+                if restored_responses != responses \
+                        or not np.array_equal(restored_vectors[:len(responses)], vectors[:len(responses)]):
+                    logger.error("❌ 加载后的条目不一致")
+                    return False
+            
+            logger.info("✅ 语义缓存测试通过")
+            return True
+            
+        except Exception as e:
+            logger.error(f"❌ 语义缓存测试失败: {e}")
+            return False
+    
+    async def test_asr_compile_fallback(self):
+        """测试 torch.compile 编译的编码器首次前向失败时 ASR 仍能初始化"""
+        asr = None
+        original_compile = torch.compile
+        
+        class BrokenCompiledModule(torch.nn.Module):
+            def forward(self, *args, **kwargs):
+                raise RuntimeError("模拟 torch.compile 后端不可用")
+        
+        try:
+            logger.info("🛠️ 测试 torch.compile 失败回退...")
+            
+            # 编译本身成功，错误到首次前向才出现（与缺少 triton 时相同）
+            torch.compile = lambda module, **kwargs: BrokenCompiledModule()
+            try:
+                asr = WhisperASR(model_name="tiny", device="cpu", backend="whisper", quantization="none")
+                initialized = await asr.initialize()
+            finally:
+                torch.compile = original_compile
+            
+            if not initialized:
+                logger.error("❌ 编译失败导致 ASR 初始化失败")
+                return False
+            
+            if asr._encoder_compiled or isinstance(asr.whisper_model.encoder, BrokenCompiledModule):
+                logger.error("❌ 未恢复即时执行的编码器")
+                return False
+            
+            logger.info("✅ torch.compile 失败回退测试通过")
+            return True
+            
+        except Exception as e:
+            logger.error(f"❌ torch.compile 失败回退测试失败: {e}")
+            return False
+        
+        finally:
+            if asr:
+                await asr.cleanup()
+    
     async def test_complete_workflow(self):
         """测试完整工作流程"""
         try: